@@ -12,6 +12,7 @@
 
 import logging
 
+from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 from horizon.utils import memoized
 from openstack_dashboard.api import nova
@@ -19,10 +20,17 @@ from openstack_dashboard.api import nova
 import tuskar_ui
 from tuskar_ui.cached_property import cached_property  # noqa
 from tuskar_ui.handle_errors import handle_errors  # noqa
+from tuskar_ui.utils import cache
 
 
 LOG = logging.getLogger(__name__)
 
+# The flavors of the plan roles are kept across requests and recomputed
+# only when the plans change, or when the entry expires.
+DEPLOYED_FLAVORS_TTL = getattr(settings, 'TUSKAR_DEPLOYED_FLAVORS_TTL', 300)
+_deployed_flavors = cache.TTLCache('deployed_flavors', maxsize=16,
+                                   ttl=DEPLOYED_FLAVORS_TTL)
+
 
 class Flavor(object):
 
@@ -85,8 +93,10 @@ class Flavor(object):
             extras_dict['baremetal:deploy_kernel_id'] = kernel_image_id
         if ramdisk_image_id is not None:
             extras_dict['baremetal:deploy_ramdisk_id'] = ramdisk_image_id
-        return cls(nova.flavor_create(request, name, memory, vcpus, disk,
-                                      metadata=extras_dict))
+        flavor = cls(nova.flavor_create(request, name, memory, vcpus, disk,
+                                        metadata=extras_dict))
+        _deployed_flavors.clear()
+        return flavor
 
     @classmethod
     @handle_errors(_("Unable to load flavor."))
@@ -109,13 +119,36 @@ class Flavor(object):
     @memoized.memoized
     @handle_errors(_("Unable to retrieve existing servers list."), [])
     def list_deployed_ids(cls, request):
-        """Get and memoize ID's of deployed flavors."""
+        """Get and memoize ID's of deployed flavors.
+
+        The servers are listed on every request, so that the flavor of any
+        server, even one booted outside of Heat, is reported. The flavors
+        of the plan roles are kept across requests, as long as the plans
+        have not changed since they were found.
+
+        :return: ID's of the flavors used by servers or by plan roles
+        :rtype:  frozenset of str
+        """
         servers = nova.server_list(request)[0]
-        deployed_ids = set(server.flavor['id'] for server in servers)
-        deployed_names = []
-        for plan in tuskar_ui.api.tuskar.Plan.list(request):
-            deployed_names.extend(
-                [plan.parameter_value(role.flavor_parameter_name)
-                 for role in plan.role_list])
-        return [flavor.id for flavor in cls.list(request)
-                if flavor.id in deployed_ids or flavor.name in deployed_names]
+        deployed_ids = frozenset(server.flavor['id'] for server in servers)
+        return deployed_ids | cls._role_flavor_ids(request)
+
+    @classmethod
+    def _role_flavor_ids(cls, request):
+        plans = tuskar_ui.api.tuskar.Plan.list(request)
+        version = tuple(sorted((plan.uuid, plan.modified_at)
+                               for plan in plans))
+        key = request.user.tenant_id
+        cached = _deployed_flavors.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # Role flavors are stored in "<role prefix>::Flavor" parameters,
+        # reading them directly avoids fetching the roles of every plan.
+        deployed_names = set(
+            parameter['value'] for plan in plans
+            for parameter in plan.parameters
+            if parameter['name'].endswith('::Flavor'))
+        role_flavor_ids = frozenset(flavor.id for flavor in cls.list(request)
+                                    if flavor.name in deployed_names)
+        _deployed_flavors.set(key, (version, role_flavor_ids))
+        return role_flavor_ids
@@ -10,29 +10,88 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import hashlib
+import json
 import logging
-import os
-import tempfile
 import urlparse
 
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
-from heatclient.common import template_utils
+from heatclient.common import environment_format
+from heatclient.common import template_format
+from heatclient.common import utils as heat_utils
+from heatclient.exc import HTTPBadRequest
 from heatclient.exc import HTTPNotFound
+from heatclient.v1 import events as heat_events
+from heatclient.v1 import resources as heat_resources
+from heatclient.v1 import stacks as heat_stacks
 from horizon.utils import memoized
 from openstack_dashboard.api import base
 from openstack_dashboard.api import heat
 from openstack_dashboard.api import keystone
+from tuskarclient.v2 import roles as tuskar_roles
 
 from tuskar_ui.api import node
 from tuskar_ui.api import tuskar
 from tuskar_ui.cached_property import cached_property  # noqa
 from tuskar_ui.handle_errors import handle_errors  # noqa
+from tuskar_ui.utils import cache
 from tuskar_ui.utils import utils
 
 
 LOG = logging.getLogger(__name__)
 
+# The plan to stack id mapping is kept until the stack goes away, the stack
+# details only shortly, to share them between the views and forms handling
+# the same or quickly following requests.
+STACK_CACHE_TTL = getattr(settings, 'TUSKAR_STACK_CACHE_TTL', 5)
+_stack_ids = cache.TTLCache('stack_ids', maxsize=16, ttl=3600)
+_stacks = cache.TTLCache('stacks', maxsize=16, ttl=STACK_CACHE_TTL)
+
+# The instance to resource mapping of each stack is kept across requests.
+RESOURCE_INDEX_TTL = getattr(settings, 'TUSKAR_RESOURCE_INDEX_TTL', 600)
+_resource_index = cache.TTLCache('resource_index', maxsize=16,
+                                 ttl=RESOURCE_INDEX_TTL)
+
+# The processed plan templates are kept by the hash of their contents.
+TEMPLATES_BASE_URL = 'file:///tuskar/templates/'
+TEMPLATE_CACHE_TTL = getattr(settings, 'TUSKAR_TEMPLATE_CACHE_TTL', 3600)
+_processed_templates = cache.TTLCache('processed_templates', maxsize=8,
+                                      ttl=TEMPLATE_CACHE_TTL)
+
+# The overcloud dashboard URLs, by stack id, KeystoneURL and admin password
+# digest. An unreachable overcloud is remembered, without URLs, for a
+# shorter time, so that it doesn't slow down every page with connection
+# timeouts.
+OVERCLOUD_CACHE_TTL = getattr(settings, 'TUSKAR_OVERCLOUD_CACHE_TTL', 600)
+OVERCLOUD_UNREACHABLE_TTL = getattr(settings,
+                                    'TUSKAR_OVERCLOUD_UNREACHABLE_TTL', 60)
+_dashboard_urls = cache.TTLCache('dashboard_urls', maxsize=8,
+                                 ttl=OVERCLOUD_CACHE_TTL)
+
+# Stack event filters understood by Heat.
+EVENT_FILTERS = ('resource_status', 'resource_action', 'resource_name',
+                 'resource_type')
+EVENTS_PAGE_SIZE = getattr(settings, 'TUSKAR_EVENTS_PAGE_SIZE', 100)
+
+# The overview shows the last few failed events of the stack, or the last
+# event if none failed. Their summary is kept across the progress polls.
+# Heat matches the status filter against the status alone, without the
+# action, so this covers the failures of all the actions.
+FAILED_EVENT_FILTERS = {'resource_status': 'FAILED'}
+LAST_FAILED_EVENTS = 3
+_event_summaries = cache.TTLCache('event_summaries', maxsize=16, ttl=3600)
+
+
+def _is_reported_failure(event):
+    return ('FAILED' in event.resource_status and
+            'aborted' not in (event.resource_status_reason or ''))
+
+
+def _event_from_dict(info):
+    return heat_events.Event(None, info, loaded=True)
+
 
 def overcloud_keystoneclient(request, endpoint, password):
     """Returns a client connected to the Keystone backend.
@@ -73,55 +132,118 @@ def overcloud_keystoneclient(request, endpoint, password):
     return conn
 
 
-def _save_templates(templates):
-    """Saves templates into tmpdir on server
+def _templates_hash(templates):
+    digests = sorted(tuskar.template_digests(templates).items())
+    return hashlib.sha1(repr(digests)).hexdigest()
 
-    This should go away and get replaced by libutils.save_templates from
-    tripleo-common https://github.com/openstack/tripleo-common/
-    """
-    output_dir = tempfile.mkdtemp()
 
-    for template_name, template_content in templates.items():
+def _parse_template(content):
+    try:
+        return template_format.parse(content)
+    except (ValueError, TypeError):
+        return None
+
 
-        # It's possible to organize the role templates and their dependent
-        # files into directories, in which case the template_name will carry
-        # the directory information. If that's the case, first create the
-        # directory structure (if it hasn't already been created by another
-        # file in the templates list).
-        template_dir = os.path.dirname(template_name)
-        output_template_dir = os.path.join(output_dir, template_dir)
-        if template_dir and not os.path.exists(output_template_dir):
-            os.makedirs(output_template_dir)
+def _directory_url(url):
+    return url.rsplit('/', 1)[0] + '/'
 
-        filename = os.path.join(output_dir, template_name)
-        with open(filename, 'w+') as template_file:
-            template_file.write(template_content)
-    return output_dir
 
+def _is_template_reference(key, value):
+    if not isinstance(value, basestring):
+        return False
+    return key == 'get_file' or (
+        key == 'type' and value.endswith(('.yaml', '.template')))
 
-def _process_templates(templates):
-    """Process templates
 
-    Due to bug in heat api
-    https://bugzilla.redhat.com/show_bug.cgi?id=1212740, we need to
-    save the templates in tmpdir, reprocess them with template_utils
-    from heatclient and then we can use them in creating/updating stack.
+def _is_environment_reference(key, value):
+    return (isinstance(value, basestring) and
+            key not in ('base_url', 'hooks') and '::' not in value)
 
-    This should be replaced by the same code that is in tripleo-common and
-    eventually it will not be needed at all.
+
+class _TemplateBundle(object):
+    """Resolve the files referenced by the plan templates in memory
+
+    This does what heatclient's template_utils does with the templates
+    saved on disk: every ``get_file`` and provider template reference is
+    replaced with an absolute URL, under which its content is put into
+    ``files``, with the nested templates resolved as well.
     """
 
-    tpl_dir = _save_templates(templates)
+    def __init__(self, templates):
+        self.templates = templates
+        self.files = {}
+
+    def read(self, url):
+        if url.startswith(TEMPLATES_BASE_URL):
+            name = url[len(TEMPLATES_BASE_URL):]
+            if name in self.templates:
+                return self.templates[name]
+        return heat_utils.read_url_content(url)
+
+    def template(self, name):
+        url = urlparse.urljoin(TEMPLATES_BASE_URL, name)
+        template = template_format.parse(self.read(url))
+        self._resolve(template, _directory_url(url), _is_template_reference)
+        return template
+
+    def environment(self, name):
+        url = urlparse.urljoin(TEMPLATES_BASE_URL, name)
+        environment = environment_format.parse(self.read(url))
+        registry = environment.get('resource_registry')
+        if registry:
+            base_url = registry.get('base_url', _directory_url(url))
+            self._resolve(registry, base_url, _is_environment_reference,
+                          recurse=False)
+            for resource in registry.get('resources', {}).values():
+                self._resolve(resource, resource.get('base_url', base_url),
+                              _is_environment_reference, recurse=False)
+        return environment
+
+    def _resolve(self, data, base_url, is_reference, recurse=True):
+        if recurse and isinstance(data, (dict, list)):
+            values = data.values() if isinstance(data, dict) else data
+            for value in values:
+                self._resolve(value, base_url, is_reference)
+        if not isinstance(data, dict):
+            return
+        if not base_url.endswith('/'):
+            base_url += '/'
+        for key, value in data.items():
+            if not is_reference(key, value):
+                continue
+            url = urlparse.urljoin(base_url, value)
+            if url not in self.files:
+                content = self.read(url)
+                template = _parse_template(content)
+                if template is not None:
+                    self._resolve(template, _directory_url(url),
+                                  _is_template_reference)
+                    content = json.dumps(template)
+                self.files[url] = content
+            data[key] = url
+
 
-    tpl_files, template = template_utils.get_template_contents(
-        template_file=os.path.join(tpl_dir, tuskar.MASTER_TEMPLATE_NAME))
-    env_files, env = (
-        template_utils.process_multiple_environments_and_files(
-            env_paths=[os.path.join(tpl_dir, tuskar.ENVIRONMENT_NAME)]))
+def _process_templates(templates):
+    """Process the plan templates for creating or updating a Stack
 
-    files = dict(list(tpl_files.items()) + list(env_files.items()))
+    Due to bug in heat api
+    https://bugzilla.redhat.com/show_bug.cgi?id=1212740, the files
+    referenced by the templates need to be resolved before they are sent.
+    This is done in memory, and the result is kept by the hash of the
+    templates, so that unchanged templates are not processed again.
 
-    return template, env, files
+    :return: the master template, the environment and the referenced files
+    :rtype:  tuple of (dict, dict, dict)
+    """
+    key = _templates_hash(templates)
+    processed = _processed_templates.get(key)
+    if processed is None:
+        bundle = _TemplateBundle(templates)
+        template = bundle.template(tuskar.MASTER_TEMPLATE_NAME)
+        environment = bundle.environment(tuskar.ENVIRONMENT_NAME)
+        processed = (template, environment, bundle.files)
+        _processed_templates.set(key, processed)
+    return copy.deepcopy(processed)
 
 
 class Stack(base.APIResourceWrapper):
@@ -130,6 +252,8 @@ class Stack(base.APIResourceWrapper):
     def __init__(self, apiresource, request=None):
         super(Stack, self).__init__(apiresource)
         self._request = request
+        self._resources_by_role = {}
+        self._joined_resources_by_role = {}
 
     @classmethod
     def create(cls, request, stack_name, templates):
@@ -143,6 +267,7 @@ class Stack(base.APIResourceWrapper):
         }
         password = getattr(settings, 'UNDERCLOUD_ADMIN_PASSWORD', None)
         stack = heat.stack_create(request, password, **fields)
+        _stack_ids.clear()
         return cls(stack, request=request)
 
     def update(self, request, stack_name, templates):
@@ -156,6 +281,7 @@ class Stack(base.APIResourceWrapper):
         }
         password = getattr(settings, 'UNDERCLOUD_ADMIN_PASSWORD', None)
         heat.stack_update(request, self.id, password, **fields)
+        _stacks.pop((request.user.tenant_id, self.id))
 
     @classmethod
     @handle_errors(_("Unable to retrieve heat stacks"), [])
@@ -182,7 +308,16 @@ class Stack(base.APIResourceWrapper):
                  found
         :rtype:  tuskar_ui.api.heat.Stack or None
         """
-        return cls(heat.stack_get(request, stack_id), request=request)
+        key = (request.user.tenant_id, stack_id)
+        info = _stacks.get(key)
+        if info is None:
+            stack = heat.stack_get(request, stack_id)
+            # Only the data is kept, the client of the stack carries the
+            # token of the request.
+            _stacks.set(key, stack.to_dict())
+        else:
+            stack = heat_stacks.Stack(None, copy.deepcopy(info), loaded=True)
+        return cls(stack, request=request)
 
     @classmethod
     @handle_errors(_("Unable to retrieve stack"))
@@ -194,6 +329,19 @@ class Stack(base.APIResourceWrapper):
                  found
         :rtype:  tuskar_ui.api.heat.Stack or None
         """
+        # Once the stack of the plan is known, it is retrieved directly.
+        key = (request.user.tenant_id, plan.id)
+        stack_id = _stack_ids.get(key)
+        if stack_id is not None:
+            try:
+                stack = Stack.get(request, stack_id, _error_handle=False)
+            except HTTPNotFound:
+                stack = None
+            if stack is not None and stack.stack_status != 'DELETE_COMPLETE':
+                return stack
+            _stack_ids.pop(key)
+            _stacks.pop((request.user.tenant_id, stack_id))
+
         # TODO(lsmola) until we have working deployment through Tuskar-API,
         # this will not work
         # for stack in Stack.list(request):
@@ -203,6 +351,7 @@ class Stack(base.APIResourceWrapper):
             stack = Stack.list(request)[0]
         except IndexError:
             return None
+        _stack_ids.set(key, stack.id)
         # TODO(lsmola) stack list actually does not contain all the detail
         # info, there should be call for that, investigate
         return Stack.get(request, stack.id)
@@ -211,74 +360,129 @@ class Stack(base.APIResourceWrapper):
     @handle_errors(_("Unable to delete Heat stack"), [])
     def delete(cls, request, stack_id):
         heat.stack_delete(request, stack_id)
+        _stacks.pop((request.user.tenant_id, stack_id))
 
-    @memoized.memoized
-    def resources(self, with_joins=True, role=None):
+    def _role_resources(self, role):
+        """Return the OS::Nova::Server Resources of a Role
+
+        The Resources are retrieved from Heat only once per Stack and Role,
+        all the following calls are answered from the index.
+
+        :param role: role of the resources
+        :type  role: tuskar_ui.api.tuskar.Role
+
+        :return: list of Resources, not joined with their Nodes
+        :rtype:  list of tuskar_ui.api.heat.Resource
+        """
+        try:
+            return self._resources_by_role[role.id]
+        except KeyError:
+            pass
+        resources = []
+        # A provider resource is deployed as a nested stack, so we have to
+        # drill down and retrieve those that match a tuskar role
+        try:
+            resource_group = heat.resource_get(self._request, self.id,
+                                               role.name)
+            group_resources = heat.resources_list(
+                self._request, resource_group.physical_resource_id)
+            for group_resource in group_resources:
+                if not group_resource.physical_resource_id:
+                    # Skip groups who has no physical resource.
+                    continue
+                nova_resources = heat.resources_list(
+                    self._request, group_resource.physical_resource_id)
+                resources.extend(Resource(resource, request=self._request,
+                                          stack=self, role=role)
+                                 for resource in nova_resources)
+        except HTTPNotFound:
+            pass
+        self._resources_by_role[role.id] = resources
+        return resources
+
+    @cached_property
+    def _nodes_by_instance_uuid(self):
+        return utils.list_to_dict(node.Node.list(self._request,
+                                                 associated=True),
+                                  key_attribute='instance_uuid')
+
+    def _joined_role_resources(self, role):
+        try:
+            return self._joined_resources_by_role[role.id]
+        except KeyError:
+            pass
+        nodes_dict = self._nodes_by_instance_uuid
+        # TODO(lsmola) I want just resources with nova instance
+        # this could be probably filtered a better way, investigate
+        resources = [
+            Resource(resource._apiresource, request=self._request,
+                     stack=self, role=role,
+                     node=nodes_dict[resource.physical_resource_id])
+            for resource in self._role_resources(role)
+            if resource.physical_resource_id in nodes_dict
+        ]
+        self._joined_resources_by_role[role.id] = resources
+        return resources
+
+    @cached_property
+    def _deployed_instance_uuids(self):
+        return node.Node.instance_uuids(self._request)
+
+    def role_node_count(self, role):
+        """Return the number of Nodes deployed for the Role
+
+        Unlike counting the joined Resources, this doesn't retrieve the
+        Nodes, only the ids of their Instances.
+
+        :param role: role of the Nodes
+        :type  role: tuskar_ui.api.tuskar.Role
+
+        :rtype: int
+        """
+        try:
+            return len(self._joined_resources_by_role[role.id])
+        except KeyError:
+            pass
+        instance_uuids = self._deployed_instance_uuids
+        return len([resource for resource in self._role_resources(role)
+                    if resource.physical_resource_id in instance_uuids])
+
+    def resources(self, with_joins=True, role=None, roles=None):
         """Return list of OS::Nova::Server Resources
 
         Return list of OS::Nova::Server Resources associated with the Stack
-        and which are associated with a Role
+        and which are associated with a Role. The Resources of each Role are
+        retrieved only once, and the Nodes are listed only once for all of
+        them, so any further calls are just slices of the same index.
 
         :param with_joins: should we also retrieve objects associated with each
                            retrieved Resource?
         :type  with_joins: bool
 
+        :param role: only return the Resources of this Role
+        :type  role: tuskar_ui.api.tuskar.Role
+
+        :param roles: only return the Resources of these Roles; the Roles of
+                      the Plan are retrieved if neither this nor ``role`` is
+                      given
+        :type  roles: list of tuskar_ui.api.tuskar.Role
+
         :return: list of all Resources or an empty list if there are none
         :rtype:  list of tuskar_ui.api.heat.Resource
         """
-
         if role:
             roles = [role]
-        else:
+        elif roles is None:
             roles = self.plan.role_list
-        resource_dicts = []
-
-        # A provider resource is deployed as a nested stack, so we have to
-        # drill down and retrieve those that match a tuskar role
+        if with_joins:
+            get_resources = self._joined_role_resources
+        else:
+            get_resources = self._role_resources
+        resources = []
         for role in roles:
-            resource_group_name = role.name
-            try:
-                resource_group = heat.resource_get(self._request,
-                                                   self.id,
-                                                   resource_group_name)
-
-                group_resources = heat.resources_list(
-                    self._request, resource_group.physical_resource_id)
-                for group_resource in group_resources:
-                    if not group_resource.physical_resource_id:
-                        # Skip groups who has no physical resource.
-                        continue
-                    nova_resources = heat.resources_list(
-                        self._request,
-                        group_resource.physical_resource_id)
-                    resource_dicts.extend([{"resource": resource,
-                                            "role": role}
-                                           for resource in nova_resources])
-
-            except HTTPNotFound:
-                pass
-
-        if not with_joins:
-            return [Resource(rd['resource'], request=self._request,
-                             stack=self, role=rd['role'])
-                    for rd in resource_dicts]
-
-        nodes_dict = utils.list_to_dict(node.Node.list(self._request,
-                                                       associated=True),
-                                        key_attribute='instance_uuid')
-        joined_resources = []
-        for rd in resource_dicts:
-            resource = rd['resource']
-            joined_resources.append(
-                Resource(resource,
-                         node=nodes_dict.get(resource.physical_resource_id,
-                                             None),
-                         request=self._request, stack=self, role=rd['role']))
-        # TODO(lsmola) I want just resources with nova instance
-        # this could be probably filtered a better way, investigate
-        return [r for r in joined_resources if r.node is not None]
+            resources.extend(get_resources(role))
+        return resources
 
-    @memoized.memoized
     def resources_count(self, overcloud_role=None):
         """Return count of associated Resources
 
@@ -288,15 +492,9 @@ class Stack(base.APIResourceWrapper):
         :return: Number of matching resources
         :rtype:  int
         """
-        # TODO(dtantsur): there should be better way to do it, rather than
-        # fetching and calling len()
         # FIXME(dtantsur): should also be able to use with_joins=False
         # but unable due to bug #1289505
-        if overcloud_role is None:
-            resources = self.resources()
-        else:
-            resources = self.resources(role=overcloud_role)
-        return len(resources)
+        return len(self.resources(role=overcloud_role))
 
     @cached_property
     def plan(self):
@@ -396,6 +594,121 @@ class Stack(base.APIResourceWrapper):
         return heat.events_list(self._request,
                                 self.stack_name)
 
+    def events_page(self, marker=None, limit=None, filters=None,
+                    sort_dir=None):
+        """Return a single page of the Heat Events of this Stack
+
+        The filters and the marker are passed through to Heat, so that only
+        the requested Events are transferred.
+
+        :param marker: id of the last Event of the previous page
+        :type  marker: str
+
+        :param limit: maximum number of Events to return
+        :type  limit: int
+
+        :param filters: Heat event filters, see EVENT_FILTERS
+        :type  filters: dict
+
+        :param sort_dir: 'asc' or 'desc' to sort the Events by time,
+                         Heat's default order is used if not given
+        :type  sort_dir: str
+
+        :return: the Events, and whether there are more of them
+        :rtype:  tuple of (list of heatclient.v1.events.Event, bool)
+        """
+        kwargs = {'marker': marker, 'filters': filters or {}}
+        if limit is not None:
+            # Ask for one more Event to know whether there is a next page.
+            kwargs['limit'] = limit + 1
+        if sort_dir is not None:
+            kwargs['sort_keys'] = 'event_time'
+            kwargs['sort_dir'] = sort_dir
+        client = heat.heatclient(self._request)
+        events = client.events.list(self.stack_name, **kwargs)
+        has_more_data = limit is not None and len(events) > limit
+        return events[:limit], has_more_data
+
+    def iter_events(self, filters=None, page_size=EVENTS_PAGE_SIZE,
+                    marker=None, sort_dir=None):
+        """Yield all the Heat Events of this Stack, a page at a time
+
+        :param filters: Heat event filters, see EVENT_FILTERS
+        :type  filters: dict
+
+        :param page_size: number of Events fetched from Heat at once
+        :type  page_size: int
+
+        :param marker: id of the Event to start after
+        :type  marker: str
+
+        :param sort_dir: 'asc' or 'desc' to sort the Events by time
+        :type  sort_dir: str
+        """
+        while True:
+            events, has_more_data = self.events_page(marker, page_size,
+                                                     filters, sort_dir)
+            for event in events:
+                yield event
+            if not (has_more_data and events):
+                return
+            marker = events[-1].id
+
+    def _load_events_summary(self):
+        last, _has_more = self.events_page(limit=1, sort_dir='desc')
+        # The aborted failures are only dropped here, so ask for a few more.
+        failed, _has_more = self.events_page(
+            limit=LAST_FAILED_EVENTS * 3, sort_dir='desc',
+            filters=FAILED_EVENT_FILTERS)
+        failed = [event for event in failed
+                  if _is_reported_failure(event)][:LAST_FAILED_EVENTS]
+        return {
+            'last': last[0].to_dict() if last else None,
+            'failed': [event.to_dict() for event in reversed(failed)],
+        }
+
+    def _update_events_summary(self, summary):
+        if summary['last'] is None:
+            return self._load_events_summary()
+        newer = list(self.iter_events(marker=summary['last']['id'],
+                                      sort_dir='asc'))
+        if not newer:
+            return summary
+        failed = summary['failed'] + [event.to_dict() for event in newer
+                                      if _is_reported_failure(event)]
+        return {
+            'last': newer[-1].to_dict(),
+            'failed': failed[-LAST_FAILED_EVENTS:],
+        }
+
+    @cached_property
+    def last_events(self):
+        """Return the last failed Heat Events and the last Heat Event
+
+        Only the recent Events are requested from Heat. The summary is kept
+        across requests, so that the following progress polls only fetch the
+        Events newer than the last one seen.
+
+        :return: up to LAST_FAILED_EVENTS failed, not aborted Events, oldest
+                 first, and the last Event of this Stack, or None
+        :rtype:  tuple of (list of heatclient.v1.events.Event,
+                 heatclient.v1.events.Event)
+        """
+        key = (self._request.user.tenant_id, self.id)
+        summary = _event_summaries.get(key)
+        if summary is None:
+            summary = self._load_events_summary()
+        else:
+            try:
+                summary = self._update_events_summary(summary)
+            except (HTTPBadRequest, HTTPNotFound):
+                # The last Event seen is gone, start over.
+                summary = self._load_events_summary()
+        _event_summaries.set(key, summary)
+        last = summary['last']
+        return ([_event_from_dict(info) for info in summary['failed']],
+                _event_from_dict(last) if last else None)
+
     @property
     def stack_outputs(self):
         return getattr(self, 'outputs', [])
@@ -411,36 +724,64 @@ class Stack(base.APIResourceWrapper):
         if self.keystone_auth_url:
             return urlparse.urlparse(self.keystone_auth_url).hostname
 
+    @cached_property
+    def _overcloud_admin_password(self):
+        return self.plan.parameter_value('Controller-1::AdminPassword')
+
+    @property
+    def _overcloud_key(self):
+        # Only a digest of the password is kept, so that the URLs found with
+        # an older password are not used anymore.
+        password = unicode(self._overcloud_admin_password or '')
+        return (self.id, self.keystone_auth_url,
+                hashlib.sha1(password.encode('utf-8')).hexdigest())
+
     @cached_property
     def overcloud_keystone(self):
+        if not self.keystone_auth_url:
+            return None
         try:
-            return overcloud_keystoneclient(
-                self._request,
-                self.keystone_auth_url,
-                self.plan.parameter_value('Controller-1::AdminPassword'))
+            return overcloud_keystoneclient(self._request,
+                                            self.keystone_auth_url,
+                                            self._overcloud_admin_password)
         except Exception:
             LOG.debug('Unable to connect to overcloud keystone.')
             return None
 
-    @cached_property
-    def dashboard_urls(self):
+    def _find_dashboard_urls(self):
         client = self.overcloud_keystone
         if not client:
-            return []
-
-        services = client.services.list()
+            return [], OVERCLOUD_UNREACHABLE_TTL
 
-        for service in services:
-            if service.name == 'horizon':
-                break
-        else:
-            return []
+        try:
+            services = client.services.list()
+
+            for service in services:
+                if service.name == 'horizon':
+                    break
+            else:
+                # The overcloud is not initialized yet.
+                return [], OVERCLOUD_UNREACHABLE_TTL
+
+            admin_urls = [endpoint.adminurl for endpoint
+                          in client.endpoints.list()
+                          if endpoint.service_id == service.id]
+        except Exception:
+            LOG.debug('Unable to list the overcloud endpoints.')
+            return [], OVERCLOUD_UNREACHABLE_TTL
+        return admin_urls, OVERCLOUD_CACHE_TTL
 
-        admin_urls = [endpoint.adminurl for endpoint
-                      in client.endpoints.list()
-                      if endpoint.service_id == service.id]
+    @cached_property
+    def dashboard_urls(self):
+        urls = _dashboard_urls.get(self._overcloud_key)
+        if urls is None:
+            urls, ttl = self._find_dashboard_urls()
+            _dashboard_urls.set(self._overcloud_key, urls, ttl=ttl)
+        return urls
 
-        return admin_urls
+    def forget_overcloud(self):
+        """Drop the cached overcloud dashboard URLs"""
+        _dashboard_urls.pop(self._overcloud_key)
 
 
 class Resource(base.APIResourceWrapper):
@@ -474,8 +815,42 @@ class Resource(base.APIResourceWrapper):
     @classmethod
     @memoized.memoized
     def _resources_by_nodes(cls, request):
-        return {resource.physical_resource_id: resource
-                for resource in cls.list_all_resources(request)}
+        """Map instance uuids to the Resources of all the stacks
+
+        The mapping of every stack is kept across requests, and it is only
+        rebuilt when the stack has been updated since, or while it is in
+        progress.
+        """
+        resources_by_nodes = {}
+        for stack in Stack.list(request):
+            key = (request.user.tenant_id, stack.id)
+            version = (stack.stack_status,
+                       getattr(stack, 'updated_time', None))
+            cached = _resource_index.get(key)
+            if cached is not None and cached[0] == version:
+                resources, roles = cached[1:]
+            else:
+                # Only keep the data of the resources and the roles, as
+                # their clients carry the token of the request.
+                resources = {}
+                roles = {}
+                for resource in stack.resources(with_joins=False):
+                    role = resource.role
+                    resources[resource.physical_resource_id] = (
+                        resource._apiresource.to_dict(), role.uuid)
+                    roles[role.uuid] = role._apiresource.to_dict()
+                if not stack.stack_status.endswith('_IN_PROGRESS'):
+                    _resource_index.set(key, (version, resources, roles))
+            roles = dict(
+                (uuid, tuskar.Role(tuskar_roles.Role(
+                    None, copy.deepcopy(info), loaded=True), request=request))
+                for (uuid, info) in roles.items())
+            for instance_uuid, (info, role_uuid) in resources.items():
+                resources_by_nodes[instance_uuid] = cls(
+                    heat_resources.Resource(None, copy.deepcopy(info),
+                                            loaded=True),
+                    request=request, stack=stack, role=roles[role_uuid])
+        return resources_by_nodes
 
     @classmethod
     def get_by_node(cls, request, node):
@@ -10,11 +10,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import functools
 import logging
+from multiprocessing import pool
 
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
-from horizon.utils import memoized
+from glanceclient.v1 import images as glance_images
 from ironic_discoverd import client as discoverd_client
 from ironicclient import client as ironic_client
 from openstack_dashboard.api import base
@@ -24,6 +27,8 @@ import requests
 
 from tuskar_ui.cached_property import cached_property  # noqa
 from tuskar_ui.handle_errors import handle_errors  # noqa
+from tuskar_ui.utils import cache
+from tuskar_ui.utils import tracing
 from tuskar_ui.utils import utils
 
 
@@ -53,35 +58,130 @@ FREE_STATE = 'free'
 
 
 IRONIC_DISCOVERD_URL = getattr(settings, 'IRONIC_DISCOVERD_URL', None)
+IMAGE_CACHE_TTL = getattr(settings, 'TUSKAR_IMAGE_CACHE_TTL', 300)
+NODE_COUNT_CACHE_TTL = getattr(settings, 'TUSKAR_NODE_COUNT_CACHE_TTL', 10)
+IMAGE_FETCH_THREADS = 8
 LOG = logging.getLogger(__name__)
 
+_images = cache.TTLCache('images', maxsize=256, ttl=IMAGE_CACHE_TTL)
+_node_counts = cache.TTLCache('node_counts', maxsize=64,
+                              ttl=NODE_COUNT_CACHE_TTL)
+
 
 def ironicclient(request):
     api_version = 1
     kwargs = {'os_auth_token': request.user.token.id,
               'ironic_url': base.url_for(request, 'baremetal')}
-    return ironic_client.get_client(api_version, **kwargs)
+    return tracing.traced_client(
+        'ironic', ironic_client.get_client(api_version, **kwargs))
+
+
+def _project_id(request):
+    return getattr(getattr(request, 'user', None), 'tenant_id', None)
 
 
 # FIXME(lsmola) This should be done in Horizon, they don't have caching
-@memoized.memoized
 @handle_errors(_("Unable to retrieve image."))
 def image_get(request, image_id):
     """Returns an Image object with metadata
 
     Returns an Image object populated with metadata for image
-    with supplied identifier.
+    with supplied identifier. The data of the images is cached across
+    requests, per project, for ``IMAGE_CACHE_TTL`` seconds.
 
-    :param image_id: list of objects to be put into a dict
-    :type  image_id: list
+    :param image_id: id of the image to be retrieved
+    :type  image_id: str
 
     :return: object
     :rtype: glanceclient.v1.images.Image
     """
-    image = glance.image_get(request, image_id)
+    project_id = _project_id(request)
+    image = _cached_image(project_id, image_id)
+    if image is None:
+        image = glance.image_get(request, image_id)
+        _cache_image(project_id, image)
     return image
 
 
+def _cached_image(project_id, image_id):
+    info = _images.get((project_id, image_id))
+    if info is not None:
+        return glance_images.Image(None, copy.deepcopy(info), loaded=True)
+
+
+def _cache_image(project_id, image):
+    # Only the data is kept, the manager of the image carries the glance
+    # client, and so the token, of the request.
+    info = image.to_dict()
+    info.setdefault('name', getattr(image, 'name', None))
+    _images.set((project_id, image.id), info)
+
+
+def _image_get_or_none(request, image_id):
+    try:
+        return glance.image_get(request, image_id)
+    except Exception:
+        LOG.debug("Unable to retrieve image %s." % image_id)
+        return None
+
+
+def images_get(request, image_ids):
+    """Returns a dict of Image objects for the supplied identifiers
+
+    The images which are not cached yet are retrieved with a single
+    ``image_list_detailed`` call, and the ones the listing leaves out, or
+    all of them if it fails, with concurrent ``image_get`` calls. They are
+    put in the cache used by ``image_get``.
+
+    :param image_ids: ids of the images to be retrieved
+    :type  image_ids: iterable of str
+
+    :return: images keyed by their ids; images that couldn't be found
+             are left out
+    :rtype: dict
+    """
+    project_id = _project_id(request)
+    images = {}
+    missing = set()
+    for image_id in set(image_ids):
+        if not image_id:
+            continue
+        image = _cached_image(project_id, image_id)
+        if image is None:
+            missing.add(image_id)
+        else:
+            images[image_id] = image
+    if not missing:
+        return images
+
+    try:
+        fetched = glance.image_list_detailed(request)[0]
+    except Exception:
+        LOG.debug("Unable to list images, retrieving them one by one.")
+        fetched = []
+    _add_images(project_id, images, missing, fetched)
+
+    # The listing is limited in size, and leaves out some of the images, so
+    # the rest is retrieved one by one.
+    missing.difference_update(images)
+    if missing:
+        workers = pool.ThreadPool(min(len(missing), IMAGE_FETCH_THREADS))
+        try:
+            fetched = workers.map(tracing.propagate(
+                functools.partial(_image_get_or_none, request)), missing)
+        finally:
+            workers.close()
+        _add_images(project_id, images, missing, fetched)
+    return images
+
+
+def _add_images(project_id, images, wanted, fetched):
+    for image in fetched:
+        if image is not None and image.id in wanted:
+            _cache_image(project_id, image)
+            images[image.id] = image
+
+
 class Node(base.APIResourceWrapper):
     _attrs = ('id', 'uuid', 'instance_uuid', 'driver', 'driver_info',
               'properties', 'power_state', 'target_power_state',
@@ -147,6 +247,7 @@ class Node(base.APIResourceWrapper):
             driver_info=driver_info,
             properties=properties,
         )
+        _node_counts.clear()
         for mac_address in mac_addresses:
             ironicclient(request).port.create(
                 node_uuid=node.uuid,
@@ -203,6 +304,10 @@ class Node(base.APIResourceWrapper):
     def list(cls, request, associated=None, maintenance=None):
         """Return a list of Nodes
 
+        The Nodes are listed with their details and joined with the
+        Instances of a single listing. Only the Instances missing from that
+        listing are retrieved one by one.
+
         :param request: request object
         :type  request: django.http.HttpRequest
 
@@ -220,18 +325,67 @@ class Node(base.APIResourceWrapper):
         :rtype:  list of tuskar_ui.api.node.Node
         """
         nodes = ironicclient(request).node.list(associated=associated,
-                                                maintenance=maintenance)
+                                                maintenance=maintenance,
+                                                detail=True)
         if associated is None or associated:
             servers = nova.server_list(request)[0]
             servers_dict = utils.list_to_dict(servers)
-            nodes_with_instance = []
             for n in nodes:
-                server = servers_dict.get(n.instance_uuid, None)
-                nodes_with_instance.append(cls(n, instance=server,
-                                               request=request))
-            return [cls.get(request, node.uuid)
-                    for node in nodes_with_instance]
-        return [cls.get(request, node.uuid) for node in nodes]
+                if (n.instance_uuid is not None and
+                        n.instance_uuid not in servers_dict):
+                    servers_dict[n.instance_uuid] = nova.server_get(
+                        request, n.instance_uuid)
+            return [cls(n, instance=servers_dict.get(n.instance_uuid, None),
+                        request=request)
+                    for n in nodes]
+        return [cls(n, request=request) for n in nodes]
+
+    @classmethod
+    @handle_errors(_("Unable to retrieve nodes"), 0)
+    def count(cls, request, associated=None, maintenance=None):
+        """Return the number of Nodes
+
+        Only the Ironic node listing is used, the Nodes are neither
+        retrieved one by one nor joined with their Instances. The counts
+        are cached for ``NODE_COUNT_CACHE_TTL`` seconds, or until a Node is
+        created, deleted or put in or out of maintenance here.
+
+        :param request: request object
+        :type  request: django.http.HttpRequest
+
+        :param associated: count all Nodes, only those associated with an
+                           Instance, or only those not associated with one
+        :type  associated: bool
+
+        :param maintenance: count all Nodes, only those in maintenance
+                            mode, or only those not in maintenance mode
+        :type  maintenance: bool
+
+        :return: the number of matching Nodes
+        :rtype:  int
+        """
+        key = (_project_id(request), associated, maintenance)
+        count = _node_counts.get(key)
+        if count is None:
+            count = len(ironicclient(request).node.list(
+                associated=associated, maintenance=maintenance))
+            _node_counts.set(key, count)
+        return count
+
+    @classmethod
+    @handle_errors(_("Unable to retrieve nodes"), frozenset())
+    def instance_uuids(cls, request):
+        """Return the ids of the Instances deployed on the Nodes
+
+        Like :meth:`count`, this only uses the Ironic node listing.
+
+        :param request: request object
+        :type  request: django.http.HttpRequest
+
+        :rtype: frozenset of str
+        """
+        nodes = ironicclient(request).node.list(associated=True)
+        return frozenset(n.instance_uuid for n in nodes)
 
     @classmethod
     def delete(cls, request, uuid):
@@ -246,7 +400,9 @@ class Node(base.APIResourceWrapper):
         :param uuid: ID of IronicNode to be removed
         :type  uuid: str
         """
-        return ironicclient(request).node.delete(uuid)
+        result = ironicclient(request).node.delete(uuid)
+        _node_counts.clear()
+        return result
 
     @classmethod
     def discover(cls, request, uuids):
@@ -283,6 +439,7 @@ class Node(base.APIResourceWrapper):
             'path': '/maintenance'
         }
         node = ironicclient(request).node.update(uuid, [patch])
+        _node_counts.clear()
         return cls(node, request)
 
     @classmethod
@@ -10,7 +10,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import hashlib
 import logging
+from multiprocessing import pool
 import random
 import string
 
@@ -19,20 +22,27 @@ from django.utils.translation import ugettext_lazy as _
 from glanceclient import exc as glance_exceptions
 from horizon.utils import memoized
 from openstack_dashboard.api import base
-from openstack_dashboard.api import glance
 from openstack_dashboard.api import neutron
-from os_cloud_config import keystone_pki
 from tuskarclient import client as tuskar_client
 
 from tuskar_ui.api import flavor
+from tuskar_ui.api import node
 from tuskar_ui.cached_property import cached_property  # noqa
 from tuskar_ui.handle_errors import handle_errors  # noqa
+from tuskar_ui.utils import cache
+from tuskar_ui.utils import pki
+from tuskar_ui.utils import tracing
 
 LOG = logging.getLogger(__name__)
 MASTER_TEMPLATE_NAME = 'plan.yaml'
 ENVIRONMENT_NAME = 'environment.yaml'
 TUSKAR_SERVICE = 'management'
 
+# The plan templates are kept for as long as the plan is not modified.
+TEMPLATES_CACHE_TTL = getattr(settings, 'TUSKAR_TEMPLATES_CACHE_TTL', 300)
+_templates = cache.TTLCache('plan_templates', maxsize=16,
+                            ttl=TEMPLATES_CACHE_TTL)
+
 SSL_HIDDEN_PARAMS = ('SSLCertificate', 'SSLKey')
 KEYSTONE_CERTIFICATE_PARAMS = (
     'KeystoneSigningCertificate', 'KeystoneCACertificate',
@@ -55,7 +65,7 @@ def tuskarclient(request, password=None):
                                       username=request.user.username,
                                       password=password,
                                       os_auth_token=request.user.token.id)
-    return client
+    return tracing.traced_client('tuskar', client)
 
 
 def password_generator(size=40, chars=(string.ascii_uppercase +
@@ -64,10 +74,26 @@ def password_generator(size=40, chars=(string.ascii_uppercase +
     return ''.join(random.choice(chars) for _ in range(size))
 
 
+def template_digests(templates):
+    """Return the SHA-1 digest of each template, keyed by its name."""
+    digests = {}
+    for name, content in templates.items():
+        if isinstance(content, unicode):
+            content = content.encode('utf-8')
+        digests[name] = hashlib.sha1(content).hexdigest()
+    return digests
+
+
 def strip_prefix(parameter_name):
     return parameter_name.split('::', 1)[-1]
 
 
+def parameter_prefix(parameter_name):
+    """Return the role prefix of the parameter, or '' for global ones."""
+    return parameter_name[:len(parameter_name) -
+                          len(strip_prefix(parameter_name))]
+
+
 def _is_blank(parameter):
     return not parameter['value'] or parameter['value'] == 'unset'
 
@@ -149,6 +175,7 @@ class Plan(base.APIResourceWrapper):
             'value': unicode(value),
         } for (name, value) in parameters.items()]
         plan = tuskarclient(request).plans.patch(plan_id, parameter_list)
+        _templates.pop(plan_id)
         return cls(plan, request=request)
 
     @classmethod
@@ -213,8 +240,10 @@ class Plan(base.APIResourceWrapper):
 
     @cached_property
     def role_list(self):
-        return [Role.get(self._request, role.uuid)
-                for role in self.roles]
+        # All the Roles are listed at once, instead of once for every Role.
+        roles = dict((role.uuid, role) for role in Role.list(self._request))
+        return [roles[role.uuid] for role in self.roles
+                if role.uuid in roles]
 
     @cached_property
     def _roles_by_name(self):
@@ -231,7 +260,15 @@ class Plan(base.APIResourceWrapper):
 
     @cached_property
     def templates(self):
-        return tuskarclient(self._request).plans.templates(self.uuid)
+        # Tuskar generates the templates from the plan, so they stay the
+        # same for as long as the plan is not modified.
+        version = self.modified_at or self.created_at
+        cached = _templates.get(self.uuid)
+        if cached is not None and version and cached[0] == version:
+            return dict(cached[1])
+        templates = tuskarclient(self._request).plans.templates(self.uuid)
+        _templates.set(self.uuid, (version, dict(templates)))
+        return templates
 
     @cached_property
     def master_template(self):
@@ -259,10 +296,77 @@ class Plan(base.APIResourceWrapper):
             params = [p for p in params if p['name'] not in key_params]
         return [Parameter(p, plan=self) for p in params]
 
-    def parameter(self, param_name):
+    @cached_property
+    def _parameters_by_name(self):
+        return dict((parameter['name'], parameter)
+                    for parameter in self.parameters)
+
+    @cached_property
+    def _parameters_by_prefix(self):
+        # The plan's parameters don't change, so they are only grouped once
+        # for every version of the plan.
+        groups = collections.defaultdict(list)
         for parameter in self.parameters:
-            if parameter['name'] == param_name:
-                return Parameter(parameter, plan=self)
+            groups[parameter_prefix(parameter['name'])].append(parameter)
+        return groups
+
+    def parameter_group(self, prefix=''):
+        """Return the parameters with the given role prefix
+
+        :param prefix: the whole prefix of a role, like ``Compute-1::``, or
+                       an empty string for the global parameters
+        :type  prefix: string
+
+        :return: the parameters, in the order of the plan
+        :rtype:  list of tuskar_ui.api.tuskar.Parameter
+        """
+        return [Parameter(p, plan=self)
+                for p in self._parameters_by_prefix.get(prefix, [])]
+
+    @cached_property
+    def _roles_by_prefix(self):
+        return dict((role.parameter_prefix, role) for role in self.role_list)
+
+    def parameter(self, param_name):
+        parameter = self._parameters_by_name.get(param_name)
+        if parameter is not None:
+            return Parameter(parameter, plan=self)
+
+    def changed_parameters(self, parameters):
+        """Return the parameters whose values differ from the Plan's
+
+        The values are compared as text, the way they are sent to Tuskar.
+
+        :param parameters: new values for the plan's parameters
+        :type  parameters: dict
+
+        :return: the new values of the changed parameters
+        :rtype:  dict
+        """
+        changed = {}
+        for name, value in parameters.items():
+            parameter = self._parameters_by_name.get(name)
+            if parameter is None or unicode(value) != unicode(
+                    parameter['value']):
+                changed[name] = value
+        return changed
+
+    def update_parameters(self, request, parameters):
+        """Send the changed parameters to Tuskar in a single patch
+
+        :param request: request object
+        :type  request: django.http.HttpRequest
+
+        :param parameters: new values for the plan's parameters
+        :type  parameters: dict
+
+        :return: the updated Plan, or this Plan if nothing has changed
+        :rtype:  tuskar_ui.api.tuskar.Plan
+        """
+        changed = self.changed_parameters(parameters)
+        if not changed:
+            return self
+        return self.patch(request, self.uuid, changed)
 
     def parameter_value(self, param_name, default=None):
         parameter = self.parameter(param_name)
@@ -270,22 +374,35 @@ class Plan(base.APIResourceWrapper):
             return parameter.value
         return default
 
+    @cached_property
+    def _generated_parameters(self):
+        """Find the parameters to generate, checking each of them once
+
+        :return: the names of the parameters to generate, in the plan's
+                 order, with what to generate and the parameters themselves
+        :rtype:  list of (str, str, Parameter) tuples
+        """
+        generated = []
+        for parameter in self.parameter_list():
+            if _should_generate_password(parameter):
+                kind = 'password'
+            elif _should_generate_keystone_cert(parameter):
+                kind = 'keystone_certificate'
+            elif _should_generate_neutron_control_plane(parameter):
+                kind = 'control_plane'
+            else:
+                continue
+            generated.append((parameter['name'], kind, parameter))
+        return generated
+
     def list_generated_parameters(self, with_prefix=True):
         if with_prefix:
             key_format = lambda key: key
         else:
             key_format = strip_prefix
 
-        # Get all password like parameters
-        return dict(
-            (key_format(parameter['name']), parameter)
-            for parameter in self.parameter_list()
-            if any([
-                _should_generate_password(parameter),
-                _should_generate_keystone_cert(parameter),
-                _should_generate_neutron_control_plane(parameter),
-            ])
-        )
+        return dict((key_format(name), parameter)
+                    for (name, kind, parameter) in self._generated_parameters)
 
     def _make_keystone_certificates(self, wanted_generated_params):
         generated_params = {}
@@ -298,50 +415,46 @@ class Plan(base.APIResourceWrapper):
         else:
             generate_certificates = False
 
-        # Generate keystone certificates
+        # Generate keystone certificates, or take pre-generated ones
         if generate_certificates:
-            ca_key_pem, ca_cert_pem = keystone_pki.create_ca_pair()
-            signing_key_pem, signing_cert_pem = (
-                keystone_pki.create_signing_pair(ca_key_pem, ca_cert_pem))
-            generated_params['KeystoneSigningCertificate'] = (
-                signing_cert_pem)
-            generated_params['KeystoneCACertificate'] = ca_cert_pem
-            generated_params['KeystoneSigningKey'] = signing_key_pem
+            generated_params.update(pki.keystone_certificates.take())
         return generated_params
 
     def make_generated_parameters(self):
         wanted_generated_params = self.list_generated_parameters(
             with_prefix=False)
 
-        # Generate keystone certificates
+        # Take the pre-generated keystone certificates
         generated_params = self._make_keystone_certificates(
             wanted_generated_params)
 
         # Generate passwords and control plane id
-        for (key, param) in wanted_generated_params.items():
-            if _should_generate_password(param):
+        control_plane_id = None
+        for (key, kind, param) in self._generated_parameters:
+            key = strip_prefix(key)
+            if kind == 'password':
                 generated_params[key] = password_generator()
-            elif _should_generate_neutron_control_plane(param):
-                generated_params[key] = neutron.network_list(
-                    self._request, name='ctlplane')[0].id
+            elif kind == 'control_plane':
+                if control_plane_id is None:
+                    control_plane_id = neutron.network_list(
+                        self._request, name='ctlplane')[0].id
+                generated_params[key] = control_plane_id
 
         # Fill all the Tuskar parameters with generated content. There are
         # parameters that has just different prefix, such parameters should
         # have the same values.
-        wanted_prefixed_params = self.list_generated_parameters(
-            with_prefix=True)
-        tuskar_params = {}
-
-        for (key, param) in wanted_prefixed_params.items():
-            tuskar_params[key] = generated_params[strip_prefix(key)]
-
-        return tuskar_params
+        return dict((key, generated_params[strip_prefix(key)])
+                    for (key, kind, param) in self._generated_parameters)
 
     @property
     def id(self):
         return self.uuid
 
 
+# A role joined with its flavor and image, either of which can be None.
+RoleJoin = collections.namedtuple('RoleJoin', ['role', 'flavor', 'image'])
+
+
 class Role(base.APIResourceWrapper):
     _attrs = ('uuid', 'name', 'version', 'description', 'created')
 
@@ -383,6 +496,58 @@ class Role(base.APIResourceWrapper):
             if role.uuid == role_id:
                 return role
 
+    @classmethod
+    def catalog(cls, request, with_images=True):
+        """Return all the Roles joined with their flavors and images
+
+        The Roles, the Plan and the flavors are retrieved concurrently,
+        and the images of all the Roles are then retrieved at once, instead
+        of looking up the flavor and image of every Role separately.
+
+        :param request: request object
+        :type  request: django.http.HttpRequest
+
+        :param with_images: whether to retrieve the images of the Roles
+        :type  with_images: bool
+
+        :return: the joined Roles keyed by their ids, in the order of the
+                 Roles; the flavor or image is None when it can't be found
+        :rtype:  collections.OrderedDict of tuskar_ui.api.tuskar.RoleJoin
+        """
+        return cls._catalog(request, with_images)
+
+    @classmethod
+    @memoized.memoized
+    def _catalog(cls, request, with_images):
+        workers = pool.ThreadPool(3)
+        try:
+            roles = workers.apply_async(
+                tracing.propagate(cls.list), (request,))
+            plan = workers.apply_async(
+                tracing.propagate(Plan.get_the_plan), (request,))
+            flavors = workers.apply_async(
+                tracing.propagate(flavor.Flavor.list), (request,))
+            roles, plan = roles.get(), plan.get()
+            if with_images:
+                images = node.images_get(request, [
+                    plan.parameter_value(role.image_id_parameter_name)
+                    for role in roles])
+            else:
+                images = {}
+            flavors_by_name = {}
+            for role_flavor in flavors.get():
+                # Take the first flavor with the name, like get_by_name.
+                flavors_by_name.setdefault(role_flavor.name, role_flavor)
+        finally:
+            workers.close()
+
+        return collections.OrderedDict((role.id, RoleJoin(
+            role,
+            flavors_by_name.get(
+                plan.parameter_value(role.flavor_parameter_name)),
+            images.get(plan.parameter_value(role.image_id_parameter_name)),
+        )) for role in roles)
+
     @classmethod
     @memoized.memoized
     def _roles_by_image_id(cls, request, plan):
@@ -452,7 +617,8 @@ class Role(base.APIResourceWrapper):
         image_id = plan.parameter_value(self.image_id_parameter_name)
         if image_id:
             try:
-                return glance.image_get(self._request, image_id)
+                return node.image_get(self._request, image_id,
+                                      _error_handle=False)
             except glance_exceptions.HTTPNotFound:
                 LOG.error("Couldn't obtain image with id %s" % image_id)
                 return None
@@ -464,7 +630,7 @@ class Role(base.APIResourceWrapper):
             return flavor.Flavor.get_by_name(self._request, flavor_name)
 
     def parameter_list(self, plan):
-        return [p for p in plan.parameter_list() if self == p.role]
+        return plan.parameter_group(self.parameter_prefix)
 
     def is_valid_for_deployment(self, plan):
         node_count = plan.get_role_node_count(self)
@@ -501,9 +667,7 @@ class Parameter(base.APIDictWrapper):
     @property
     def role(self):
         if self.plan:
-            for role in self.plan.role_list:
-                if self.name.startswith(role.parameter_prefix):
-                    return role
+            return self.plan._roles_by_prefix.get(parameter_prefix(self.name))
 
     def is_required(self):
         """Boolean: True if parameter is required, False otherwise."""
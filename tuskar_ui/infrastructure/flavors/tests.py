@@ -37,6 +37,7 @@ INDEX_URL = urlresolvers.reverse(
 CREATE_URL = urlresolvers.reverse(
     'horizon:infrastructure:flavors:create')
 DETAILS_VIEW = 'horizon:infrastructure:flavors:details'
+IRONIC_NODE_MANAGER = 'tuskar_ui.api.node.ironicclient.return_value.node'
 
 
 @contextlib.contextmanager
@@ -71,7 +72,10 @@ class FlavorsTest(test.BaseAdminViewTests):
                  for role in self.tuskarclient_roles.list()]
 
         with contextlib.nested(
-                patch('tuskar_ui.api.node.ironicclient'),
+                patch('tuskar_ui.api.node.ironicclient', **{
+                    'return_value.node.list.return_value':
+                        self.ironicclient_nodes.list(),
+                }),
                 patch('tuskar_ui.api.tuskar.Plan.list',
                       return_value=plans),
                 patch('tuskar_ui.api.tuskar.Role.list',
@@ -79,16 +83,57 @@ class FlavorsTest(test.BaseAdminViewTests):
                 patch('openstack_dashboard.api.nova.flavor_list',
                       return_value=TEST_DATA.novaclient_flavors.list()),
                 patch('openstack_dashboard.api.nova.server_list',
-                      return_value=([], False)),
-        ) as (ironic_mock, plans_mock, roles_mock, flavors_mock, servers_mock):
-            res = self.client.get(INDEX_URL)
+                      return_value=(self.novaclient_servers.list(), False)),
+                patch('openstack_dashboard.api.nova.server_get'),
+        ) as (ironic_mock, plans_mock, roles_mock, flavors_mock,
+              servers_mock, server_get_mock):
+            # The real Node.list runs for the flavor suggestions, and the
+            # listed nodes are not retrieved again one by one.
+            with self.assertCallBudget({
+                IRONIC_NODE_MANAGER + '.list': 1,
+                IRONIC_NODE_MANAGER + '.get': 0,
+                'openstack_dashboard.api.nova.flavor_get': 0,
+                'openstack_dashboard.api.nova.server_get': 0,
+            }):
+                res = self.client.get(INDEX_URL)
             self.assertEqual(plans_mock.call_count, 1)
-            self.assertEqual(roles_mock.call_count, 4)
+            self.assertEqual(roles_mock.call_count, 0)
             self.assertEqual(flavors_mock.call_count, 3)
             self.assertEqual(servers_mock.call_count, 2)
 
         self.assertTemplateUsed(res, 'infrastructure/flavors/index.html')
 
+    def test_index_deployed_flavors_cached(self):
+        plans = [api.tuskar.Plan(plan, self.request)
+                 for plan in TEST_DATA.tuskarclient_plans.list()]
+
+        with contextlib.nested(
+                patch('tuskar_ui.api.node.ironicclient'),
+                patch('tuskar_ui.api.tuskar.Plan.list',
+                      return_value=plans),
+                patch('openstack_dashboard.api.nova.flavor_list',
+                      return_value=TEST_DATA.novaclient_flavors.list()),
+                patch('openstack_dashboard.api.nova.server_list',
+                      return_value=([], False)),
+        ) as (ironic_mock, plans_mock, flavors_mock, servers_mock):
+            self.client.get(INDEX_URL)
+            self.client.get(INDEX_URL)
+            # The second request reuses the flavors of the plan roles, so
+            # Flavor.list is called just for the table and the suggestions.
+            # The servers are listed again.
+            self.assertEqual(servers_mock.call_count, 4)
+            self.assertEqual(flavors_mock.call_count, 5)
+
+            # The flavor of a server booted outside of Heat is deployed
+            # right away.
+            flavor = TEST_DATA.novaclient_flavors.first()
+            server = servers.Server(
+                servers.ServerManager(None),
+                {'id': 'aa', 'flavor': {'id': flavor.id}})
+            servers_mock.return_value = ([server], False)
+            self.assertIn(flavor.id,
+                          api.flavor.Flavor.list_deployed_ids(self.request))
+
     def test_index_recoverable_failure(self):
         with patch(
             'openstack_dashboard.api.nova.flavor_list',
@@ -177,7 +222,9 @@ class FlavorsTest(test.BaseAdminViewTests):
             self.assertRedirectsNoFollow(res, INDEX_URL)
 
     def test_details_no_overcloud(self):
-        flavor = api.flavor.Flavor(TEST_DATA.novaclient_flavors.first())
+        flavors = [api.flavor.Flavor(f)
+                   for f in TEST_DATA.novaclient_flavors.list()]
+        flavor = flavors[0]
         plan = api.tuskar.Plan(TEST_DATA.tuskarclient_plans.first())
         roles = [api.tuskar.Role(role)
                  for role in self.tuskarclient_roles.list()]
@@ -188,18 +235,21 @@ class FlavorsTest(test.BaseAdminViewTests):
                 patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
                       return_value=plan),
                 patch('tuskar_ui.api.tuskar.Role.list', return_value=roles),
-                patch('tuskar_ui.api.tuskar.Role.flavor', return_value=flavor),
-        ) as (get_mock, plan_mock, roles_mock, role_flavor_mock):
+                patch('tuskar_ui.api.flavor.Flavor.list',
+                      return_value=flavors),
+        ) as (get_mock, plan_mock, roles_mock, flavor_list_mock):
             res = self.client.get(urlresolvers.reverse(DETAILS_VIEW,
                                                        args=(flavor.id,)))
             self.assertEqual(get_mock.call_count, 1)
             self.assertEqual(plan_mock.call_count, 2)
             self.assertEqual(roles_mock.call_count, 1)
-            self.assertEqual(role_flavor_mock.call_count, 8)
+            self.assertEqual(flavor_list_mock.call_count, 1)
         self.assertTemplateUsed(res, 'infrastructure/flavors/details.html')
 
     def test_details(self):
-        flavor = api.flavor.Flavor(TEST_DATA.novaclient_flavors.first())
+        flavors = [api.flavor.Flavor(f)
+                   for f in TEST_DATA.novaclient_flavors.list()]
+        flavor = flavors[0]
         plan = api.tuskar.Plan(TEST_DATA.tuskarclient_plans.first())
         roles = [api.tuskar.Role(role)
                  for role in self.tuskarclient_roles.list()]
@@ -211,22 +261,24 @@ class FlavorsTest(test.BaseAdminViewTests):
                 patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
                       return_value=plan),
                 patch('tuskar_ui.api.tuskar.Role.list', return_value=roles),
-                patch('tuskar_ui.api.tuskar.Role.flavor', return_value=flavor),
+                patch('tuskar_ui.api.flavor.Flavor.list',
+                      return_value=flavors),
                 patch('tuskar_ui.api.heat.Stack.get_by_plan',
                       return_value=stack),
                 # __name__ is required for horizon.tables
                 patch('tuskar_ui.api.heat.Stack.resources_count',
                       return_value=42, __name__='')
-        ) as (flavor_mock, plan_mock, roles_mock, role_flavor_mock,
+        ) as (flavor_mock, plan_mock, roles_mock, flavor_list_mock,
               stack_mock, count_mock):
             res = self.client.get(urlresolvers.reverse(DETAILS_VIEW,
                                                        args=(flavor.id,)))
             self.assertEqual(flavor_mock.call_count, 1)
             self.assertEqual(plan_mock.call_count, 2)
             self.assertEqual(roles_mock.call_count, 1)
-            self.assertEqual(role_flavor_mock.call_count, 8)
+            self.assertEqual(flavor_list_mock.call_count, 1)
             self.assertEqual(stack_mock.call_count, 1)
-            self.assertEqual(count_mock.call_count, 4)
+            # Only the Controller and Compute roles use the flavor.
+            self.assertEqual(count_mock.call_count, 2)
         self.assertTemplateUsed(res, 'infrastructure/flavors/details.html')
 
 
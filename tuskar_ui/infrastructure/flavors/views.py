@@ -96,8 +96,6 @@ class DetailView(horizon.tables.DataTableView):
 
     def get_data(self):
         flavor_id = self.kwargs.get('flavor_id')
-        plan = api.tuskar.Plan.get_the_plan(self.request)
-
-        return [role for role in api.tuskar.Role.list(self.request)
-                if role.flavor(plan)
-                and role.flavor(plan).id == flavor_id]
+        catalog = api.tuskar.Role.catalog(self.request, with_images=False)
+        return [role for (role, role_flavor, role_image) in catalog.values()
+                if role_flavor and role_flavor.id == flavor_id]
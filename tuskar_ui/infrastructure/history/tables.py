@@ -12,9 +12,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import urllib
+
 from django.utils.translation import ugettext_lazy as _
 from horizon import tables
 
+from tuskar_ui import api
+
 
 class HistoryTable(tables.DataTable):
 
@@ -28,6 +32,14 @@ class HistoryTable(tables.DataTable):
     resource_status_reason = tables.Column('resource_status_reason',
                                            verbose_name=_("Reason"))
 
+    def get_pagination_string(self):
+        # Keep the event filters when moving to the next page.
+        params = sorted((key, value) for key, value in self.request.GET.items()
+                        if key in api.heat.EVENT_FILTERS)
+        params.append((self._meta.pagination_param,
+                       self.get_object_id(self.data[-1])))
+        return urllib.urlencode(params)
+
     class Meta(object):
         name = "log"
         verbose_name = _("Deployment Log")
@@ -13,6 +13,7 @@
 #    under the License.
 
 import contextlib
+import json
 
 from django.core import urlresolvers
 from mock import patch, call  # noqa
@@ -29,6 +30,8 @@ heat_data.data(TEST_DATA)
 tuskar_data.data(TEST_DATA)
 INDEX_URL = urlresolvers.reverse(
     'horizon:infrastructure:history:index')
+EXPORT_URL = urlresolvers.reverse(
+    'horizon:infrastructure:history:export')
 
 
 class HistoryTest(test.BaseAdminViewTests):
@@ -45,9 +48,86 @@ class HistoryTest(test.BaseAdminViewTests):
                       return_value=plan),
                 patch('tuskar_ui.api.heat.Stack.get_by_plan',
                       return_value=stack),
-                patch('tuskar_ui.api.heat.Stack.events',
-                      return_value=events)
-        ):
+                patch('tuskar_ui.api.heat.Stack.events_page',
+                      return_value=(events, False)),
+        ) as (get_the_plan, get_by_plan, events_page):
             res = self.client.get(INDEX_URL)
 
         self.assertTemplateUsed(res, 'infrastructure/history/index.html')
+        events_page.assert_called_once_with(marker=None, limit=20,
+                                            filters={})
+
+    def test_index_filtered_page(self):
+        plan = api.tuskar.Plan(
+            TEST_DATA.tuskarclient_plans.first())
+        stack = api.heat.Stack(
+            TEST_DATA.heatclient_stacks.first())
+        events = TEST_DATA.heatclient_events.list()[:2]
+
+        with contextlib.nested(
+                patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
+                      return_value=plan),
+                patch('tuskar_ui.api.heat.Stack.get_by_plan',
+                      return_value=stack),
+                patch('tuskar_ui.api.heat.Stack.events_page',
+                      return_value=(events, True)),
+        ) as (get_the_plan, get_by_plan, events_page):
+            res = self.client.get(
+                INDEX_URL + '?resource_status=COMPLETE&marker=4')
+
+        events_page.assert_called_once_with(
+            marker='4', limit=20,
+            filters={'resource_status': 'COMPLETE'})
+        self.assertContains(res, '?resource_status=COMPLETE&amp;'
+                                 'marker=2')
+
+    def test_export(self):
+        plan = api.tuskar.Plan(
+            TEST_DATA.tuskarclient_plans.first())
+        stack = api.heat.Stack(
+            TEST_DATA.heatclient_stacks.first())
+        events = TEST_DATA.heatclient_events.list()
+
+        with contextlib.nested(
+                patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
+                      return_value=plan),
+                patch('tuskar_ui.api.heat.Stack.get_by_plan',
+                      return_value=stack),
+                patch('tuskar_ui.api.heat.Stack.iter_events',
+                      return_value=iter(events)),
+        ) as (get_the_plan, get_by_plan, iter_events):
+            res = self.client.get(EXPORT_URL + '?format=csv'
+                                  '&resource_name=Compute0')
+            lines = ''.join(res.streaming_content).splitlines()
+
+        iter_events.assert_called_once_with(
+            filters={'resource_name': 'Compute0'})
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertEqual(len(lines), len(events) + 1)
+        self.assertEqual(lines[1], '2014-01-01T07:26:15Z,Controller,'
+                                   'CREATE_IN_PROGRESS,state changed')
+
+    def test_export_json(self):
+        events = TEST_DATA.heatclient_events.list()
+
+        with contextlib.nested(
+                patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
+                      return_value=None),
+        ):
+            res = self.client.get(EXPORT_URL + '?format=json')
+            self.assertEqual(json.loads(''.join(res.streaming_content)), [])
+
+        stack = api.heat.Stack(
+            TEST_DATA.heatclient_stacks.first())
+        with contextlib.nested(
+                patch('tuskar_ui.api.tuskar.Plan.get_the_plan'),
+                patch('tuskar_ui.api.heat.Stack.get_by_plan',
+                      return_value=stack),
+                patch('tuskar_ui.api.heat.Stack.iter_events',
+                      return_value=iter(events)),
+        ):
+            res = self.client.get(EXPORT_URL + '?format=json')
+            data = json.loads(''.join(res.streaming_content))
+
+        self.assertEqual(len(data), len(events))
+        self.assertEqual(data[0]['resource_name'], 'Controller')
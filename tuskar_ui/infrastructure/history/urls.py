@@ -20,4 +20,5 @@ from tuskar_ui.infrastructure.history import views
 urlpatterns = urls.patterns(
     '',
     urls.url(r'^$', views.IndexView.as_view(), name='index'),
+    urls.url(r'^export$', views.ExportView.as_view(), name='export'),
 )
@@ -12,20 +12,126 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import csv
+import json
+import urllib
+
+from django.core.urlresolvers import reverse
+from django import http
+from django.views.generic import base
 from horizon import tables as horizon_tables
+from horizon.utils import functions
 
 from tuskar_ui import api
+from tuskar_ui.cached_property import cached_property  # noqa
 from tuskar_ui.infrastructure.history import tables
 
 
+EXPORT_FIELDS = ('event_time', 'resource_name', 'resource_status',
+                 'resource_status_reason')
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+}
+
+
+def get_event_filters(request):
+    """Return the Heat event filters given in the request query string."""
+    return dict((key, request.GET[key]) for key in api.heat.EVENT_FILTERS
+                if request.GET.get(key))
+
+
+def get_stack(request):
+    plan = api.tuskar.Plan.get_the_plan(request)
+    if plan:
+        return api.heat.Stack.get_by_plan(request, plan)
+
+
+class _Echo(object):
+    """File-like object returning what is written, for streaming a csv."""
+
+    def write(self, value):
+        return value
+
+
+def _encode(value):
+    if value is None:
+        return ''
+    return unicode(value).encode('utf-8')
+
+
+def _csv_lines(events):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for event in events:
+        yield writer.writerow([_encode(getattr(event, field, None))
+                               for field in EXPORT_FIELDS])
+
+
+def _json_chunks(events):
+    yield '['
+    separator = ''
+    for event in events:
+        yield separator + json.dumps(dict(
+            (field, getattr(event, field, None)) for field in EXPORT_FIELDS))
+        separator = ','
+    yield ']'
+
+
 class IndexView(horizon_tables.DataTableView):
     table_class = tables.HistoryTable
     template_name = "infrastructure/history/index.html"
 
+    @cached_property
+    def _events_page(self):
+        stack = get_stack(self.request)
+        if not stack:
+            return [], False
+        marker = self.request.GET.get(
+            self.table_class._meta.pagination_param, None)
+        return stack.events_page(
+            marker=marker,
+            limit=functions.get_page_size(self.request),
+            filters=get_event_filters(self.request))
+
     def get_data(self):
-        plan = api.tuskar.Plan.get_the_plan(self.request)
-        if plan:
-            stack = api.heat.Stack.get_by_plan(self.request, plan)
-            if stack:
-                return stack.events
-        return []
+        return self._events_page[0]
+
+    def has_more_data(self, table):
+        return self._events_page[1]
+
+    def get_context_data(self, **kwargs):
+        context = super(IndexView, self).get_context_data(**kwargs)
+        query = get_event_filters(self.request)
+        context['export_urls'] = []
+        for export_format in sorted(EXPORT_CONTENT_TYPES):
+            query['format'] = export_format
+            context['export_urls'].append((
+                export_format.upper(),
+                '%s?%s' % (reverse('horizon:infrastructure:history:export'),
+                           urllib.urlencode(sorted(query.items()))),
+            ))
+        return context
+
+
+class ExportView(base.View):
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise http.Http404
+
+        stack = get_stack(request)
+        if stack:
+            events = stack.iter_events(filters=get_event_filters(request))
+        else:
+            events = iter([])
+
+        if export_format == 'json':
+            content = _json_chunks(events)
+        else:
+            content = _csv_lines(events)
+        response = http.StreamingHttpResponse(
+            content, content_type=EXPORT_CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = (
+            'attachment; filename="deployment-log.%s"' % export_format)
+        return response
@@ -43,8 +43,11 @@ class ImagesTest(test.BaseAdminViewTests):
             patch('openstack_dashboard.api.glance.image_list_detailed',
                   return_value=[self.glanceclient_images.list(),
                                 False, False]),):
-
-            res = self.client.get(INDEX_URL)
+            with self.assertCallBudget({
+                'openstack_dashboard.api.glance.image_list_detailed': 1,
+                'openstack_dashboard.api.glance.image_get': 0,
+            }):
+                res = self.client.get(INDEX_URL)
 
         self.assertTemplateUsed(res, 'infrastructure/images/index.html')
 
@@ -35,6 +35,7 @@ from tuskar_ui.test.test_data import tuskar_data
 INDEX_URL = urlresolvers.reverse('horizon:infrastructure:nodes:index')
 REGISTER_URL = urlresolvers.reverse('horizon:infrastructure:nodes:register')
 DETAIL_VIEW = 'horizon:infrastructure:nodes:node_detail'
+IRONIC_NODE_MANAGER = 'tuskar_ui.api.node.ironicclient.return_value.node'
 PERFORMANCE_VIEW = 'horizon:infrastructure:nodes:performance'
 TEST_DATA = utils.TestDataContainer()
 node_data.data(TEST_DATA)
@@ -84,34 +85,51 @@ class NodesTests(test.BaseAdminViewTests):
                 for node in self.ironicclient_nodes.list()]
 
     def _test_index_tab(self, tab_name, nodes):
-        with mock.patch('tuskar_ui.api.node.Node', **{
-            'spec_set': ['list'],
-            'list.return_value': nodes,
-        }) as Node:
-            res = self.client.get(INDEX_URL + '?tab=nodes__' + tab_name)
-            self.assertEqual(Node.list.call_count, 3)
+        # Only the clients are mocked, so that the budget covers the calls
+        # made by the real Node.list.
+        with contextlib.nested(
+            mock.patch('tuskar_ui.api.node.ironicclient', **{
+                'return_value.node.list.return_value': nodes,
+            }),
+            mock.patch('openstack_dashboard.api.nova.server_list',
+                       return_value=(self.novaclient_servers.list(), False)),
+            mock.patch('openstack_dashboard.api.nova.server_get'),
+            mock.patch('openstack_dashboard.api.heat.stacks_list',
+                       return_value=([], False, False)),
+        ):
+            # The nodes are listed once for the view and once for each of
+            # the provisioned and free tabs, and never retrieved one by one.
+            with self.assertCallBudget({
+                IRONIC_NODE_MANAGER + '.list': 3,
+                IRONIC_NODE_MANAGER + '.get': 0,
+                'openstack_dashboard.api.nova.server_list': 2,
+                'openstack_dashboard.api.nova.server_get': 0,
+                'openstack_dashboard.api.heat.stacks_list': 1,
+            }):
+                res = self.client.get(INDEX_URL + '?tab=nodes__' + tab_name)
 
         self.assertTemplateUsed(
             res, 'infrastructure/nodes/index.html')
         self.assertTemplateUsed(res, 'horizon/common/_detail_table.html')
         self.assertItemsEqual(
-            res.context[tab_name + '_nodes_table_table'].data,
-            nodes)
+            [node.uuid
+             for node in res.context[tab_name + '_nodes_table_table'].data],
+            [node.uuid for node in nodes])
 
     def test_all_nodes(self):
-        nodes = self._all_mocked_nodes()
+        nodes = self.ironicclient_nodes.list()
         self._test_index_tab('all', nodes)
 
     def test_provisioned_nodes(self):
-        nodes = self._all_mocked_nodes()
+        nodes = self.ironicclient_nodes.list()
         self._test_index_tab('provisioned', nodes)
 
     def test_free_nodes(self):
-        nodes = self._all_mocked_nodes()
+        nodes = self.ironicclient_nodes.list()
         self._test_index_tab('free', nodes)
 
     def test_maintenance_nodes(self):
-        nodes = self._all_mocked_nodes()[6:]
+        nodes = self.ironicclient_nodes.list()[6:]
         self._test_index_tab('maintenance', nodes)
 
     def _test_index_tab_list_exception(self, tab_name):
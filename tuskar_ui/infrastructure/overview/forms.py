@@ -12,10 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
 import logging
 
 from django.conf import settings
 import django.forms
+from django.utils import translation
 from django.utils.translation import ugettext_lazy as _
 import horizon.exceptions
 import horizon.forms
@@ -28,8 +30,10 @@ from os_cloud_config.utils import clients
 from tuskar_ui import api
 import tuskar_ui.api.heat
 import tuskar_ui.api.tuskar
+from tuskar_ui.cached_property import cached_property  # noqa
 import tuskar_ui.forms
 import tuskar_ui.infrastructure.flavors.utils as flavors_utils
+from tuskar_ui.utils import cache
 
 MATCHING_DEPLOYMENT_MODE = flavors_utils.matching_deployment_mode()
 LOG = logging.getLogger(__name__)
@@ -43,106 +47,203 @@ MESSAGE_ICONS = {
 WEBROOT = getattr(settings, 'WEBROOT', '/')
 
 
-def validate_roles(request, plan):
-    """Validates the roles in plan and returns dict describing the issues"""
+# The results of the validation rules are kept for as long as their inputs
+# stay the same. The node and flavor inventories change outside of the plan,
+# so they are only kept shortly.
+VALIDATION_CACHE_TTL = getattr(settings, 'TUSKAR_VALIDATION_CACHE_TTL', 300)
+VALIDATION_INVENTORY_TTL = getattr(settings,
+                                   'TUSKAR_VALIDATION_INVENTORY_TTL', 10)
+_validation_results = cache.TTLCache('validation_results', maxsize=256,
+                                     ttl=VALIDATION_CACHE_TTL)
+_validation_inventory = cache.TTLCache('validation_inventory', maxsize=64,
+                                       ttl=VALIDATION_INVENTORY_TTL)
+VALIDATION_RULES = []
+
+
+def validation_rule(*inputs):
+    """Register a plan validation rule depending on the given inputs
+
+    The inputs are names of ValidationInputs attributes. The rule is called
+    with the ValidationInputs and returns a list of messages, which is only
+    computed again when one of the inputs has changed.
+    """
+    def decorator(check):
+        VALIDATION_RULES.append((check, inputs))
+        return check
+    return decorator
+
+
+class ValidationInputs(object):
+    """The data checked by the validation rules, each retrieved once
+
+    The version of an input is its ``<name>_version`` attribute if there is
+    one, or else the input itself.
+    """
+
+    def __init__(self, request, plan):
+        self.request = request
+        self.plan = plan
+
+    def version(self, name):
+        if hasattr(type(self), name + '_version'):
+            return getattr(self, name + '_version')
+        return getattr(self, name)
+
+    @cached_property
+    def tenant_id(self):
+        return getattr(getattr(self.request, 'user', None), 'tenant_id', None)
+
+    def _inventory(self, name, retrieve):
+        key = (self.tenant_id, name)
+        value = _validation_inventory.get(key)
+        if value is None:
+            value = retrieve()
+            _validation_inventory.set(key, value)
+        return value
+
+    @cached_property
+    def parameters(self):
+        return self.plan.parameter_list()
+
+    @cached_property
+    def parameters_version(self):
+        # The role parameters come and go with the roles, so this covers
+        # the roles of the plan as well.
+        digest = hashlib.sha1()
+        for parameter in self.plan.parameters:
+            digest.update(repr((parameter['name'], parameter['value'])))
+        return digest.hexdigest()
+
+    @cached_property
+    def free_node_count(self):
+        # Node.count keeps its own short-lived cache of the counts.
+        return api.node.Node.count(self.request, associated=False,
+                                   maintenance=False)
+
+    @cached_property
+    def flavor_names(self):
+        return self._inventory('flavors', lambda: tuple(
+            flavor.name for flavor in api.flavor.Flavor.list(self.request)))
+
+    @cached_property
+    def image_ids(self):
+        """The ids of the images of the roles that exist."""
+        image_ids = [
+            self.plan.parameter_value(role.image_id_parameter_name)
+            for role in self.plan.role_list]
+        return frozenset(api.node.images_get(self.request, image_ids))
+
+
+@validation_rule('flavor_names')
+def _validate_flavors(inputs):
+    if not inputs.flavor_names:
+        return [{
+            'text': _(u"Define Flavors."),
+            'is_critical': True,
+            'status': 'pending',
+        }]
+    return [{
+        'text': _(u"Define Flavors."),
+        'status': 'ok',
+    }]
+
+
+@validation_rule('parameters', 'free_node_count')
+def _validate_nodes(inputs):
+    plan = inputs.plan
+    requested_nodes = sum(plan.get_role_node_count(role)
+                          for role in plan.role_list)
+    available_nodes = inputs.free_node_count
+    if available_nodes == 0:
+        return [{
+            'text': _(u"Register Nodes."),
+            'is_critical': True,
+            'status': 'pending',
+        }]
+    elif requested_nodes > available_nodes:
+        return [{
+            'text': _(u"Not enough registered nodes for this plan. "
+                      u"You need {0} more.").format(
+                          requested_nodes - available_nodes),
+            'is_critical': True,
+            'status': 'error',
+        }]
+    return [{
+        'text': _(u"Register Nodes."),
+        'status': 'ok',
+    }]
+
+
+@validation_rule('parameters', 'flavor_names', 'image_ids')
+def _validate_roles(inputs):
+    """Check that the roles with nodes have all they need to deploy."""
+    plan = inputs.plan
+    pending_prefixes = set(
+        api.tuskar.parameter_prefix(parameter.name)
+        for parameter in api.tuskar.Parameter.pending_parameters(
+            api.tuskar.Parameter.required_parameters(inputs.parameters)))
     for role in plan.role_list:
-        if (
-            plan.get_role_node_count(role) and
-            not role.is_valid_for_deployment(plan)
-        ):
-            message = {
+        if not plan.get_role_node_count(role):
+            continue
+        image_id = plan.parameter_value(role.image_id_parameter_name)
+        flavor_name = plan.parameter_value(role.flavor_parameter_name)
+        if (image_id not in inputs.image_ids or
+                flavor_name not in inputs.flavor_names or
+                role.parameter_prefix in pending_prefixes):
+            return [{
                 'text': _(u"Configure Roles."),
                 'is_critical': True,
                 'status': 'pending',
-            }
-            break
-    else:
-        message = {
-            'text': _(u"Configure Roles."),
-            'status': 'ok',
-        }
-    return message
+            }]
+    return [{
+        'text': _(u"Configure Roles."),
+        'status': 'ok',
+    }]
 
 
-def validate_global_parameters(request, plan):
+@validation_rule('parameters')
+def _validate_global_parameters(inputs):
     pending_required_global_params = list(
         api.tuskar.Parameter.pending_parameters(
             api.tuskar.Parameter.required_parameters(
-                api.tuskar.Parameter.global_parameters(
-                    plan.parameter_list()))))
+                inputs.plan.parameter_group())))
     if pending_required_global_params:
-        message = {
+        return [{
             'text': _(u"Global Service Configuration."),
             'is_critical': True,
             'status': 'pending',
-        }
-    else:
-        message = {
-            'text': _(u"Global Service Configuration."),
-            'status': 'ok',
-        }
-    return message
+        }]
+    return [{
+        'text': _(u"Global Service Configuration."),
+        'status': 'ok',
+    }]
+
+
+@validation_rule('parameters', 'flavor_names')
+def _validate_default_flavor(inputs):
+    if MATCHING_DEPLOYMENT_MODE or not inputs.flavor_names:
+        return []
+    # All roles have to have the same flavor.
+    plan = inputs.plan
+    default_flavor_name = inputs.flavor_names[0]
+    messages = []
+    for role in plan.role_list:
+        flavor_name = plan.parameter_value(role.flavor_parameter_name)
+        if flavor_name != default_flavor_name:
+            messages.append({
+                'text': _(u"Role {0} doesn't use default flavor.").format(
+                    role.name,
+                ),
+                'is_critical': False,
+                'status': 'error',
+            })
+    return messages
 
 
-def validate_plan(request, plan):
-    """Validates the plan and returns a list of dicts describing the issues."""
+@validation_rule('parameters')
+def _validate_assigned_roles(inputs):
+    plan = inputs.plan
     messages = []
-    requested_nodes = 0
-    for role in plan.role_list:
-        node_count = plan.get_role_node_count(role)
-        requested_nodes += node_count
-    available_flavors = len(api.flavor.Flavor.list(request))
-    if available_flavors == 0:
-        messages.append({
-            'text': _(u"Define Flavors."),
-            'is_critical': True,
-            'status': 'pending',
-        })
-    else:
-        messages.append({
-            'text': _(u"Define Flavors."),
-            'status': 'ok',
-        })
-    available_nodes = len(api.node.Node.list(request, associated=False,
-                                             maintenance=False))
-    if available_nodes == 0:
-        messages.append({
-            'text': _(u"Register Nodes."),
-            'is_critical': True,
-            'status': 'pending',
-        })
-    elif requested_nodes > available_nodes:
-        messages.append({
-            'text': _(u"Not enough registered nodes for this plan. "
-                      u"You need {0} more.").format(
-                          requested_nodes - available_nodes),
-            'is_critical': True,
-            'status': 'error',
-        })
-    else:
-        messages.append({
-            'text': _(u"Register Nodes."),
-            'status': 'ok',
-        })
-    messages.append(validate_roles(request, plan))
-    messages.append(validate_global_parameters(request, plan))
-    if not MATCHING_DEPLOYMENT_MODE:
-        # All roles have to have the same flavor.
-        default_flavor_name = api.flavor.Flavor.list(request)[0].name
-        for role in plan.role_list:
-            if role.flavor(plan).name != default_flavor_name:
-                messages.append({
-                    'text': _(u"Role {0} doesn't use default flavor.").format(
-                        role.name,
-                    ),
-                    'is_critical': False,
-                    'statis': 'error',
-                })
-    roles_assigned = True
-    messages.append({
-        'text': _(u"Assign roles."),
-        'status': lambda: 'ok' if roles_assigned else 'pending',
-    })
     try:
         controller_role = plan.get_role_by_name("Controller")
     except KeyError:
@@ -152,7 +253,6 @@ def validate_plan(request, plan):
             'status': 'error',
             'indent': 1,
         })
-        roles_assigned = False
     else:
         if plan.get_role_node_count(controller_role) not in (1, 3):
             messages.append({
@@ -161,7 +261,6 @@ def validate_plan(request, plan):
                 'status': 'pending',
                 'indent': 1,
             })
-            roles_assigned = False
         else:
             messages.append({
                 'text': _(u"1 or 3 Controllers Needed."),
@@ -178,7 +277,6 @@ def validate_plan(request, plan):
             'status': 'error',
             'indent': 1,
         })
-        roles_assigned = False
     else:
         if plan.get_role_node_count(compute_role) < 1:
             messages.append({
@@ -187,18 +285,42 @@ def validate_plan(request, plan):
                 'status': 'pending',
                 'indent': 1,
             })
-            roles_assigned = False
         else:
             messages.append({
                 'text': _(u"1 Compute Needed."),
                 'status': 'ok',
                 'indent': 1,
             })
+
+    roles_assigned = not any(message.get('is_critical')
+                             for message in messages)
+    messages.insert(0, {
+        'text': _(u"Assign roles."),
+        'status': 'ok' if roles_assigned else 'pending',
+    })
+    return messages
+
+
+def validate_plan(request, plan):
+    """Validates the plan and returns a list of dicts describing the issues.
+
+    Each validation rule is only checked again when one of its inputs has
+    changed since the last time, otherwise its previous result is used.
+    """
+    inputs = ValidationInputs(request, plan)
+    language = translation.get_language()
+    messages = []
+    for check, names in VALIDATION_RULES:
+        key = (inputs.tenant_id, plan.uuid, language, check.__name__) + tuple(
+            inputs.version(name) for name in names)
+        result = _validation_results.get(key)
+        if result is None:
+            result = check(inputs)
+            _validation_results.set(key, result)
+        messages.extend(dict(message) for message in result)
     for message in messages:
-        status = message.get('status')
-        if callable(status):
-            message['status'] = status = status()
-        message['classes'] = MESSAGE_ICONS.get(status, MESSAGE_ICONS[None])
+        message['classes'] = MESSAGE_ICONS.get(message.get('status'),
+                                               MESSAGE_ICONS[None])
     return messages
 
 
@@ -241,7 +363,8 @@ class EditPlan(horizon.forms.SelfHandlingForm):
                 l3ha_param = controller_role.parameter_prefix + 'NeutronL3HA'
                 parameters[l3ha_param] = 'True'
         try:
-            self.plan = self.plan.patch(request, self.plan.uuid, parameters)
+            # Only the changed counts are sent, if any.
+            self.plan = self.plan.update_parameters(request, parameters)
         except Exception as e:
             horizon.exceptions.handle(request, _("Unable to update the plan."))
             LOG.exception(e)
@@ -484,6 +607,8 @@ class PostDeployInit(horizon.forms.SelfHandlingForm):
                                       _("Unable to initialize Overcloud."))
             return False
         else:
+            # The dashboard endpoint has just been registered.
+            stack.forget_overcloud()
             msg = _('Overcloud has been initialized.')
             horizon.messages.success(request, msg)
             return True
@@ -13,8 +13,10 @@
 #    under the License.
 
 import contextlib
+import json
 
 from django.core import urlresolvers
+import mock
 from mock import patch, call  # noqa
 from openstack_dashboard.test.test_data import utils
 
@@ -34,6 +36,9 @@ DELETE_URL = urlresolvers.reverse(
     'horizon:infrastructure:overview:undeploy_confirmation')
 POST_DEPLOY_INIT_URL = urlresolvers.reverse(
     'horizon:infrastructure:overview:post_deploy_init')
+AUTOSAVE_URL = urlresolvers.reverse(
+    'horizon:infrastructure:overview:autosave')
+IRONIC_NODE_MANAGER = 'tuskar_ui.api.node.ironicclient.return_value.node'
 TEST_DATA = utils.TestDataContainer()
 heat_data.data(TEST_DATA)
 tuskar_data.data(TEST_DATA)
@@ -60,6 +65,8 @@ def _mock_plan(**kwargs):
             'list_generated_parameters',
             'make_generated_parameters',
             'parameter_list',
+            'parameter_group',
+            'update_parameters',
         ],
         'create.side_effect': lambda *args, **kwargs: plan,
         'delete.return_value': None,
@@ -70,6 +77,8 @@ def _mock_plan(**kwargs):
         'patch.side_effect': lambda *args, **kwargs: plan,
         'role_list': [],
         'parameter_list.return_value': [],
+        'parameter_group.return_value': [],
+        'update_parameters.side_effect': lambda *args, **kwargs: plan,
         'parameter_value.return_value': None,
         'get_role_by_name.side_effect': KeyError,
         'get_role_node_count.return_value': 0,
@@ -88,7 +97,7 @@ class OverviewTests(test.BaseAdminViewTests):
         with contextlib.nested(
             _mock_plan(),
             patch('tuskar_ui.api.heat.Stack.list', return_value=[]),
-            patch('tuskar_ui.api.node.Node.list', return_value=[]),
+            patch('tuskar_ui.api.node.Node.count', return_value=0),
             patch('tuskar_ui.api.flavor.Flavor.list', return_value=[]),
         ):
             res = self.client.get(INDEX_URL)
@@ -102,7 +111,7 @@ class OverviewTests(test.BaseAdminViewTests):
             self.assertListEqual(api.heat.Stack.list.call_args_list, [
                 call(request),
             ])
-            self.assertListEqual(api.node.Node.list.call_args_list, [
+            self.assertListEqual(api.node.Node.count.call_args_list, [
                 call(request, associated=False, maintenance=False),
             ])
             self.assertListEqual(api.flavor.Flavor.list.call_args_list, [
@@ -117,7 +126,7 @@ class OverviewTests(test.BaseAdminViewTests):
         with contextlib.nested(
             _mock_plan(),
             patch('tuskar_ui.api.heat.Stack.list', return_value=[]),
-            patch('tuskar_ui.api.node.Node.list', return_value=[]),
+            patch('tuskar_ui.api.node.Node.count', return_value=0),
             patch('tuskar_ui.api.flavor.Flavor.list', return_value=[]),
         ) as (plan, _stack_list, _node_list, _flavor_list):
             data = {
@@ -135,8 +144,8 @@ class OverviewTests(test.BaseAdminViewTests):
                 call(request),
             ])
             self.assertListEqual(
-                api.tuskar.Plan.patch.call_args_list,
-                [call(request, plan.id, {})],
+                api.tuskar.Plan.update_parameters.call_args_list,
+                [call(request, {})],
             )
 
     def test_index_stack_deployed(self):
@@ -149,8 +158,8 @@ class OverviewTests(test.BaseAdminViewTests):
                               'get_role_by_name.return_value': roles[0]}),
                 patch('tuskar_ui.api.heat.Stack.get_by_plan',
                       return_value=stack),
-                patch('tuskar_ui.api.heat.Stack.events',
-                      return_value=[]),
+                patch('tuskar_ui.api.heat.Stack.last_events',
+                      new=([], None)),
         ) as (Plan, stack_get_mock, stack_events_mock):
             res = self.client.get(INDEX_URL)
             request = Plan.get_the_plan.call_args_list[0][0][0]
@@ -169,26 +178,94 @@ class OverviewTests(test.BaseAdminViewTests):
 
     def test_index_stack_undeploy_in_progress(self):
         stack = api.heat.Stack(TEST_DATA.heatclient_stacks.first())
+        roles = [api.tuskar.Role(role)
+                 for role in self.tuskarclient_roles.list()]
+        resources = self.heatclient_resources.list()
+        nested = {
+            'Controller-group': [mock.Mock(physical_resource_id='c-stack')],
+            'c-stack': [resources[1]],
+            'Compute-group': [mock.Mock(physical_resource_id='n-stack')],
+            'n-stack': [resources[0], resources[2], resources[3]],
+        }
 
         with contextlib.nested(
-                _mock_plan(),
+                _mock_plan(role_list=roles),
                 patch('tuskar_ui.api.heat.Stack.get_by_plan',
                       return_value=stack),
                 patch('tuskar_ui.api.heat.Stack.is_deleting',
                       return_value=True),
                 patch('tuskar_ui.api.heat.Stack.is_deployed',
                       return_value=False),
-                patch('tuskar_ui.api.heat.Stack.resources',
-                      return_value=[]),
-                patch('tuskar_ui.api.heat.Stack.events',
-                      return_value=[]),
+                patch('tuskar_ui.api.heat.Stack.last_events',
+                      new=([], None)),
+                # Only the clients are mocked, so that the budget covers the
+                # calls made by the real Stack.resources and Node.list.
+                patch('openstack_dashboard.api.heat.resource_get',
+                      side_effect=lambda request, stack_id, name: mock.Mock(
+                          physical_resource_id=name + '-group')),
+                patch('openstack_dashboard.api.heat.resources_list',
+                      side_effect=lambda request, stack_id: nested.get(
+                          stack_id, [])),
+                patch('tuskar_ui.api.node.ironicclient', **{
+                    'return_value.node.list.return_value':
+                        self.ironicclient_nodes.list(),
+                }),
+                patch('openstack_dashboard.api.nova.server_list',
+                      return_value=(self.novaclient_servers.list(), False)),
+                patch('openstack_dashboard.api.nova.server_get'),
         ):
-            res = self.client.get(INDEX_URL)
+            # The resources of every role are retrieved once, with a call per
+            # nested stack, for both the role summaries and the progress, and
+            # they are joined with the nodes of a single listing.
+            with self.assertCallBudget({
+                'openstack_dashboard.api.heat.resource_get': len(roles),
+                'openstack_dashboard.api.heat.resources_list': len(roles) + 2,
+                IRONIC_NODE_MANAGER + '.list': 1,
+                IRONIC_NODE_MANAGER + '.get': 0,
+                'openstack_dashboard.api.nova.server_list': 1,
+                'openstack_dashboard.api.nova.server_get': 0,
+            }):
+                res = self.client.get(INDEX_URL)
 
         self.assertTemplateUsed(
             res, 'infrastructure/overview/index.html')
         self.assertTemplateUsed(
             res, 'infrastructure/overview/deployment_progress.html')
+        self.assertEqual(
+            [role['total_node_count'] for role in res.context['roles']],
+            [1, 3, 0, 0])
+        self.assertEqual(res.context['progress'], 40)
+
+    def test_autosave_post(self):
+        with contextlib.nested(
+            _mock_plan(),
+            patch('tuskar_ui.api.node.Node.count', return_value=0),
+            patch('tuskar_ui.api.flavor.Flavor.list', return_value=[]),
+        ) as (plan, _node_list, _flavor_list):
+            res = self.client.post(AUTOSAVE_URL, {
+                'sequence': 1,
+                'counts': json.dumps({'role-1-count': 1}),
+            })
+            data = json.loads(res.content)
+            self.assertEqual(data['sequence'], 1)
+            self.assertTrue(data['saved'])
+            self.assertTrue(data['plan_invalid'])
+            self.assertEqual(api.tuskar.Plan.update_parameters.call_count, 1)
+
+    def test_autosave_post_failed(self):
+        with patch.object(views.AutosaveView, 'save', side_effect=Exception):
+            res = self.client.post(AUTOSAVE_URL, {
+                'sequence': 1,
+                'counts': json.dumps({'role-1-count': 1}),
+            })
+        data = json.loads(res.content)
+        self.assertEqual(data['sequence'], 1)
+        self.assertFalse(data['saved'])
+        self.assertTrue(data['plan_invalid'])
+
+    def test_autosave_post_invalid(self):
+        res = self.client.post(AUTOSAVE_URL, {'sequence': 'x'})
+        self.assertEqual(res.status_code, 400)
 
     def test_deploy_get(self):
         with _mock_plan():
@@ -325,8 +402,7 @@ class OverviewTests(test.BaseAdminViewTests):
         plan = api.tuskar.Plan(self.tuskarclient_plans.first())
         stack = api.heat.Stack(self.heatclient_stacks.first())
         role = api.tuskar.Role(self.tuskarclient_roles.first())
-        stack.resources = lambda *args, **kwargs: []
-        ret = views._get_role_data(plan, stack, None, role)
+        ret = views._get_role_data(plan, stack, None, role, [])
         self.assertEqual(ret, {
             'deployed_node_count': 0,
             'deploying_node_count': 0,
@@ -343,11 +419,67 @@ class OverviewTests(test.BaseAdminViewTests):
             'waiting_node_count': 0,
         })
 
+    def test_get_roles_data(self):
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first())
+        stack = api.heat.Stack(self.heatclient_stacks.first())
+        roles = [api.tuskar.Role(role)
+                 for role in self.tuskarclient_roles.list()]
+        plan.role_list = roles
+
+        def resource(role, status):
+            return mock.Mock(role=role, node=mock.Mock(
+                instance=mock.Mock(status=status)))
+
+        resources = [
+            resource(roles[0], 'ACTIVE'),
+            resource(roles[1], 'ACTIVE'),
+            resource(roles[1], 'BUILD'),
+            resource(roles[1], 'ERROR'),
+        ]
+        stack.resources = mock.Mock(return_value=resources)
+        ret = views._get_roles_data(plan, stack, None)
+        # The resources of all the roles of the plan are retrieved at once,
+        # without looking the plan up again.
+        stack.resources.assert_called_once_with(with_joins=True, roles=roles)
+        self.assertEqual([r['id'] for r in ret], [r.id for r in roles])
+        self.assertEqual(ret[0]['deployed_node_count'], 1)
+        self.assertEqual(ret[0]['total_node_count'], 1)
+        self.assertEqual(ret[1]['deployed_node_count'], 1)
+        self.assertEqual(ret[1]['deploying_node_count'], 1)
+        self.assertEqual(ret[1]['error_node_count'], 1)
+        self.assertEqual(ret[1]['status'], 'danger')
+        self.assertEqual(ret[2]['total_node_count'], 0)
+
+    def test_validate_plan_cached(self):
+        with (
+            _mock_plan()
+        ) as plan, (
+            patch('tuskar_ui.api.node.ironicclient')
+        ) as ironicclient, (
+            patch('tuskar_ui.api.flavor.Flavor.list', return_value=[])
+        ) as flavor_list:
+            node_list = ironicclient.return_value.node.list
+            node_list.return_value = []
+            first = forms.validate_plan(None, plan)
+            # The plan is the same, so are the messages, and the node and
+            # flavor inventories are not retrieved again.
+            self.assertEqual(first, forms.validate_plan(None, plan))
+            self.assertEqual(node_list.call_count, 1)
+            self.assertEqual(flavor_list.call_count, 1)
+
+            # Changed parameters only run the rules depending on them, so
+            # only the flavors rule result is reused.
+            hits = forms._validation_results.hits
+            plan.parameters = [{'name': 'Compute-1::count', 'value': 1}]
+            forms.validate_plan(None, plan)
+            self.assertEqual(forms._validation_results.hits, hits + 1)
+            self.assertEqual(node_list.call_count, 1)
+
     def test_validate_plan_empty(self):
         with (
             _mock_plan()
         ) as plan, (
-            patch('tuskar_ui.api.node.Node.list', return_value=[])
+            patch('tuskar_ui.api.node.Node.count', return_value=0)
         ), (
             patch('tuskar_ui.api.flavor.Flavor.list', return_value=[])
         ):
@@ -391,3 +523,4 @@ class OverviewTests(test.BaseAdminViewTests):
                 'classes': 'fa-exclamation-circle text-danger',
             },
         ])
+
@@ -32,4 +32,7 @@ urlpatterns = urls.patterns(
     urls.url(r'^scale-out$',
              views.ScaleOutView.as_view(),
              name='scale_out'),
+    urls.url(r'^autosave$',
+             views.AutosaveView.as_view(),
+             name='autosave'),
 )
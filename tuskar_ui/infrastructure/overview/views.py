@@ -12,21 +12,27 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import json
+import logging
 
 from django.core.urlresolvers import reverse
 from django.core.urlresolvers import reverse_lazy
 from django import http
 import django.utils.text
 from django.utils.translation import ugettext_lazy as _
+from django.views.generic import base
 import heatclient
 import horizon.forms
 
 from tuskar_ui import api
 from tuskar_ui.infrastructure.overview import forms
 from tuskar_ui.infrastructure import views
+from tuskar_ui.utils import pki
 
 
+LOG = logging.getLogger(__name__)
+
 INDEX_URL = 'horizon:infrastructure:overview:index'
 
 
@@ -36,12 +42,79 @@ def _steps_message(messages):
     return _("{0} of {1} Steps Completed").format(completed_steps, total_steps)
 
 
-def _get_role_data(plan, stack, form, role):
+def _validation_results(request, form, handled):
+    """Validates the plan saved by the form, for the JSON responses."""
+    if handled:
+        messages = forms.validate_plan(request, form.plan)
+    else:
+        messages = [{
+            'text': _(u"Error saving the plan."),
+            'is_critical': True,
+        }]
+        messages.extend({
+            'text': repr(error),
+        } for error in form.non_field_errors())
+        messages.extend({
+            'text': repr(error),
+        } for field in form for error in field.errors)
+    return _results(handled, messages)
+
+
+def _save_failed_results():
+    """The results of a save that failed before the plan was validated."""
+    return _results(False, [{
+        'text': _(u"Error saving the plan."),
+        'is_critical': True,
+    }])
+
+
+def _results(saved, messages):
+    # We need to unlazify all the lazy urls and translations.
+    return {
+        'saved': bool(saved),
+        'plan_invalid': any(m.get('is_critical') for m in messages),
+        'steps_message': unicode(_steps_message(messages)),
+        'messages': [{
+            'text': unicode(m.get('text', '')),
+            'is_critical': m.get('is_critical', False),
+            'indent': m.get('indent', 0),
+            'classes': m.get('classes', ''),
+        } for m in messages],
+    }
+
+
+def _get_role_nodes(plan, stack):
+    """Gathers the deployed nodes of all the roles at once.
+
+    The resources of all the roles of the already loaded plan are retrieved
+    in a single pass, which lists the nodes only once, and bucketed by role.
+
+    :return: lists of nodes keyed by role id
+    :rtype:  dict
+    """
+    nodes_by_role = collections.defaultdict(list)
+    if stack:
+        for resource in stack.resources(with_joins=True,
+                                        roles=plan.role_list):
+            nodes_by_role[resource.role.id].append(resource.node)
+    return nodes_by_role
+
+
+def _get_roles_data(plan, stack, form):
+    """Gathers data about all the deployment roles in a single pass."""
+    nodes_by_role = _get_role_nodes(plan, stack)
+    return [_get_role_data(plan, stack, form, role,
+                           nodes=nodes_by_role[role.id])
+            for role in plan.role_list]
+
+
+def _get_role_data(plan, stack, form, role, nodes):
     """Gathers data about a single deployment role.
 
     Gathers data about a single deployment role from the related Overcloud
     and Role objects, and presents it in the form convenient for use
-    from the template.
+    from the template. The deployed ``nodes`` of the role are passed in,
+    as they are retrieved for all the roles at once.
 
     """
     data = {
@@ -53,8 +126,6 @@ def _get_role_data(plan, stack, form, role):
     }
 
     if stack:
-        resources = stack.resources(role=role, with_joins=True)
-        nodes = [r.node for r in resources]
         node_count = len(nodes)
 
         deployed_node_count = 0
@@ -64,12 +135,11 @@ def _get_role_data(plan, stack, form, role):
 
         status = 'warning'
         if nodes:
-            deployed_node_count = sum(1 for node in nodes
-                                      if node.instance.status == 'ACTIVE')
-            deploying_node_count = sum(1 for node in nodes
-                                       if node.instance.status == 'BUILD')
-            error_node_count = sum(1 for node in nodes
-                                   if node.instance.status == 'ERROR')
+            statuses = collections.Counter(node.instance.status
+                                           for node in nodes)
+            deployed_node_count = statuses['ACTIVE']
+            deploying_node_count = statuses['BUILD']
+            error_node_count = statuses['ERROR']
             waiting_node_count = (node_count - deployed_node_count -
                                   deploying_node_count - error_node_count)
 
@@ -162,22 +232,19 @@ class IndexView(horizon.forms.ModalFormView, views.StackMixin):
         context['plan'] = plan
         context['stack'] = stack
 
-        roles = [_get_role_data(plan, stack, form, role)
-                 for role in plan.role_list]
+        roles = _get_roles_data(plan, stack, form)
         context['roles'] = roles
 
         if stack:
             context['show_last_events'] = True
-            failed_events = [e for e in stack.events
-                             if 'FAILED' in e.resource_status and
-                             'aborted' not in e.resource_status_reason][-3:]
+            failed_events, last_event = stack.last_events
 
             if failed_events:
                 context['last_events_title'] = _('Last failed events')
                 context['last_events'] = failed_events
             else:
                 context['last_events_title'] = _('Last event')
-                context['last_events'] = [stack.events[0]]
+                context['last_events'] = [last_event] if last_event else []
 
             if stack.is_deleting or stack.is_delete_failed:
                 # TODO(lsmola) since at this point we don't have total number
@@ -188,8 +255,8 @@ class IndexView(horizon.forms.ModalFormView, views.StackMixin):
                 total_num_nodes_count = 10
 
                 try:
-                    resources_count = len(
-                        stack.resources(with_joins=False))
+                    resources_count = len(stack.resources(
+                        with_joins=False, roles=plan.role_list))
                 except heatclient.exc.HTTPNotFound:
                     # Immediately after undeploying has started, heat returns
                     # this exception so we can take it as kind of init of
@@ -237,30 +304,47 @@ class IndexView(horizon.forms.ModalFormView, views.StackMixin):
             handled = form.handle(self.request, form.cleaned_data)
         else:
             handled = False
-        if handled:
-            messages = forms.validate_plan(request, form.plan)
-        else:
-            messages = [{
-                'text': _(u"Error saving the plan."),
-                'is_critical': True,
-            }]
-            messages.extend({
-                'text': repr(error),
-            } for error in form.non_field_errors)
-            messages.extend({
-                'text': repr(error),
-            } for field in form.fields for error in field.errors)
-        # We need to unlazify all the lazy urls and translations.
-        return http.HttpResponse(json.dumps({
-            'plan_invalid': any(m.get('is_critical') for m in messages),
-            'steps_message': _steps_message(messages),
-            'messages': [{
-                'text': unicode(m.get('text', '')),
-                'is_critical': m.get('is_critical', False),
-                'indent': m.get('indent', 0),
-                'classes': m['classes'],
-            } for m in messages],
-        }), content_type='application/json')
+        return http.HttpResponse(
+            json.dumps(_validation_results(request, form, handled)),
+            content_type='application/json')
+
+
+class AutosaveView(base.View):
+    """Saves the changed node counts, and returns the validation results.
+
+    The counts changed by the client, keyed by the count field names, are
+    posted as JSON together with a sequence number, which is sent back with
+    the results. The client debounces the changes, and only posts the next
+    ones once the previous post is answered.
+    """
+
+    def post(self, request, *args, **kwargs):
+        try:
+            sequence = int(request.POST['sequence'])
+            counts = dict((str(name), int(count)) for (name, count)
+                          in json.loads(request.POST['counts']).items())
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return http.HttpResponseBadRequest()
+        try:
+            result = self.save(request, counts)
+        except Exception:
+            LOG.exception("Unable to save the plan.")
+            result = _save_failed_results()
+        result = dict(result, sequence=sequence)
+        return http.HttpResponse(json.dumps(result),
+                                 content_type='application/json')
+
+    def save(self, request, counts):
+        # The data is only validated later, so the counts that didn't
+        # change can be taken from the initial values of the form.
+        form = forms.EditPlan(request, data={})
+        data = dict((name, field.initial)
+                    for (name, field) in form.fields.items())
+        data.update((name, count) for (name, count) in counts.items()
+                    if name in data)
+        form.data = data
+        handled = form.is_valid() and form.handle(request, form.cleaned_data)
+        return _validation_results(request, form, handled)
 
 
 class DeployConfirmationView(horizon.forms.ModalFormView, views.StackMixin):
@@ -275,6 +359,10 @@ class DeployConfirmationView(horizon.forms.ModalFormView, views.StackMixin):
 
         context['autogenerated_parameters'] = (
             plan.list_generated_parameters(with_prefix=False).keys())
+        if any(name in api.tuskar.KEYSTONE_CERTIFICATE_PARAMS
+               for name in context['autogenerated_parameters']):
+            # Have the certificates ready by the time the deploy is confirmed.
+            pki.keystone_certificates.refill()
         return context
 
     def get_success_url(self):
@@ -337,8 +425,7 @@ class ScaleOutView(horizon.forms.ModalFormView, views.StackMixin):
         context = super(ScaleOutView, self).get_context_data(*args, **kwargs)
         plan = api.tuskar.Plan.get_the_plan(self.request)
         form = context.get('form')
-        roles = [_get_role_data(plan, None, form, role)
-                 for role in plan.role_list]
+        roles = _get_roles_data(plan, None, form)
         context.update({
             'roles': roles,
             'plan': plan,
@@ -12,9 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import hashlib
 import json
 import logging
 
+from django.conf import settings
 import django.forms
 from django.utils.datastructures import SortedDict
 from django.utils.translation import ugettext_lazy as _
@@ -24,11 +27,17 @@ import horizon.messages
 
 from tuskar_ui import api
 import tuskar_ui.forms
+from tuskar_ui.utils import cache
 from tuskar_ui.utils import utils
 
 
 LOG = logging.getLogger(__name__)
 
+FIELD_SPECS_CACHE_TTL = getattr(settings, 'TUSKAR_FIELD_SPECS_CACHE_TTL',
+                                3600)
+_field_specs = cache.TTLCache('parameter_field_specs', maxsize=32,
+                              ttl=FIELD_SPECS_CACHE_TTL)
+
 
 VIRT_TYPE_CHOICES = [
     ('kvm', _("Baremetal (kvm)")),
@@ -46,18 +55,49 @@ CINDER_ISCSI_HELPER_CHOICES = [
 ]
 
 
+# The parameter prefixes of the fieldsets of the service configuration,
+# the global parameters having none.
+FIELDSETS = collections.OrderedDict([
+    ('global', None),
+    ('controller', 'Controller-1::'),
+    ('compute', 'Compute-1::'),
+    ('block-storage', 'Cinder-Storage-1::'),
+    ('object-storage', 'Swift-Storage-1::'),
+    ('ceph-storage', 'Ceph-Storage-1::'),
+])
+
+
 class ParameterAwareMixin(object):
     parameter = None
 
 
-def parameter_fields(request, prefix=None, read_only=False):
-    fields = SortedDict()
-    plan = api.tuskar.Plan.get_the_plan(request)
-    parameters = plan.parameter_list(include_key_parameters=False)
+# The parameter-aware classes are only created once for every field class.
+PARAMETER_AWARE_FIELDS = dict(
+    (Field, type('ParameterAwareField', (ParameterAwareMixin, Field), {}))
+    for Field in (django.forms.CharField, django.forms.IntegerField,
+                  django.forms.BooleanField, django.forms.ChoiceField)
+)
+
 
+def _parameter_schema_key(plan):
+    """Identify the definitions of the plan's parameters, not the values."""
+    digest = hashlib.sha1()
+    for parameter in plan.parameters:
+        digest.update(repr(sorted(
+            (key, value) for (key, value) in parameter.items()
+            if key != 'value')))
+    return digest.hexdigest()
+
+
+def _compile_field_specs(parameters, read_only):
+    """Work out the field class and arguments for every parameter
+
+    :return: the field classes and keyword arguments, keyed by the names
+             of the parameters
+    :rtype:  dict
+    """
+    specs = {}
     for p in parameters:
-        if prefix and not p.name.startswith(prefix):
-            continue
         Field = django.forms.CharField
         field_kwargs = {}
         widget = None
@@ -82,16 +122,48 @@ def parameter_fields(request, prefix=None, read_only=False):
             elif (p.parameter_type in ['json', 'comma_delimited_list'] or
                   'Certificate' in p.name):
                 widget = django.forms.Textarea
+        # The fields copy the widget instances, so they can be shared.
+        field_kwargs.update(label=_parameter_label(p), widget=widget)
+        specs[p.name] = (PARAMETER_AWARE_FIELDS[Field], field_kwargs)
+    return specs
+
+
+def parameter_fields(request, prefix=None, read_only=False,
+                     global_only=False):
+    """Make the form fields for the parameters of the plan
 
-        fields[p.name] = Field(
-            required=False,
-            label=_parameter_label(p),
-            initial=p.value,
-            widget=widget,
-            **field_kwargs
-        )
-        fields[p.name].__class__ = type('ParameterAwareField',
-                                        (ParameterAwareMixin, Field), {})
+    Working out the fields is only done once for the same definitions of
+    the parameters, and only the fields themselves are made every time.
+    The key parameters of the roles get no fields.
+
+    :param prefix: only make the fields of the role with this whole
+                   parameter prefix, like ``Compute-1::``
+    :param global_only: only make the fields of the global parameters
+    """
+    fields = SortedDict()
+    plan = api.tuskar.Plan.get_the_plan(request)
+
+    key = (read_only, _parameter_schema_key(plan))
+    specs = _field_specs.get(key)
+    if specs is None:
+        specs = _compile_field_specs(
+            plan.parameter_list(include_key_parameters=False), read_only)
+        _field_specs.set(key, specs)
+
+    if prefix:
+        parameters = plan.parameter_group(prefix)
+    elif global_only:
+        parameters = plan.parameter_group()
+    else:
+        parameters = plan.parameter_list()
+
+    for p in parameters:
+        try:
+            Field, field_kwargs = specs[p.name]
+        except KeyError:
+            continue
+        fields[p.name] = Field(required=False, initial=p.value,
+                               **field_kwargs)
         fields[p.name].parameter = p
     return fields
 
@@ -103,9 +175,20 @@ def _parameter_label(parameter):
 
 
 class ServiceConfig(horizon.forms.SelfHandlingForm):
+    read_only = True
+
     def __init__(self, *args, **kwargs):
+        # Only the fields of a single fieldset are made when it is given.
+        self.fieldset = kwargs.pop('fieldset', None)
         super(ServiceConfig, self).__init__(*args, **kwargs)
-        self.fields.update(parameter_fields(self.request, read_only=True))
+        if self.fieldset is None:
+            fields = parameter_fields(self.request, read_only=self.read_only)
+        else:
+            prefix = FIELDSETS[self.fieldset]
+            fields = parameter_fields(self.request, prefix=prefix,
+                                      global_only=prefix is None,
+                                      read_only=self.read_only)
+        self.fields.update(fields)
 
     def global_fieldset(self):
         return tuskar_ui.forms.fieldset(self, prefix='^(?!.*::)')
@@ -130,16 +213,14 @@ class ServiceConfig(horizon.forms.SelfHandlingForm):
 
 
 class AdvancedEditServiceConfig(ServiceConfig):
-    def __init__(self, *args, **kwargs):
-        super(AdvancedEditServiceConfig, self).__init__(*args, **kwargs)
-        self.fields.update(parameter_fields(self.request))
+    read_only = False
 
     def handle(self, request, data):
         plan = api.tuskar.Plan.get_the_plan(self.request)
         data = self._sync_common_params_across_roles(plan, data)
 
         try:
-            plan.patch(request, plan.uuid, data)
+            plan.update_parameters(request, data)
         except Exception as e:
             horizon.exceptions.handle(
                 request,
@@ -154,13 +235,28 @@ class AdvancedEditServiceConfig(ServiceConfig):
 
     @staticmethod
     def _sync_common_params_across_roles(plan, parameters_dict):
-        for (p_key, p_value) in parameters_dict.iteritems():
-            for role in plan.role_list:
-                role_parameter_key = (role.parameter_prefix +
-                                      api.tuskar.strip_prefix(p_key))
-                if role_parameter_key in parameters_dict:
-                    parameters_dict[role_parameter_key] = p_value
-        return parameters_dict
+        """Give the same value to the parameters shared by the roles
+
+        The parameters are grouped by their names without the role prefix.
+        When any parameter of a group has been changed, its new value is
+        given to the whole group.
+        """
+        prefixes = set(role.parameter_prefix for role in plan.role_list)
+        groups = collections.defaultdict(list)
+        for key in parameters_dict:
+            name = api.tuskar.strip_prefix(key)
+            if key == name or key[:-len(name)] in prefixes:
+                groups[name].append(key)
+
+        changed = plan.changed_parameters(parameters_dict)
+        synced = dict(parameters_dict)
+        for keys in groups.values():
+            changed_keys = sorted(key for key in keys if key in changed)
+            if len(keys) > 1 and changed_keys:
+                value = parameters_dict[changed_keys[0]]
+                for key in keys:
+                    synced[key] = value
+        return synced
 
 
 class SimpleEditServiceConfig(horizon.forms.SelfHandlingForm):
@@ -225,8 +321,7 @@ class SimpleEditServiceConfig(horizon.forms.SelfHandlingForm):
         # Set the same parameter and value in all roles.
         for role in plan.role_list:
             key = role.parameter_prefix + param_name
-            if key in [parameter.name
-                       for parameter in role.parameter_list(plan)]:
+            if plan.parameter(key) is not None:
                 params[key] = param_value
 
         return params
@@ -268,7 +363,7 @@ class SimpleEditServiceConfig(horizon.forms.SelfHandlingForm):
             'extra_config', 'ExtraConfig'))
 
         try:
-            plan.patch(request, plan.uuid, parameters)
+            plan.update_parameters(request, parameters)
         except Exception as e:
             horizon.exceptions.handle(
                 request,
@@ -19,6 +19,7 @@ from mock import patch, call, ANY  # noqa
 from openstack_dashboard.test.test_data import utils
 
 from tuskar_ui import api
+from tuskar_ui.infrastructure.parameters import forms
 from tuskar_ui.test import helpers as test
 from tuskar_ui.test.test_data import tuskar_data
 
@@ -29,6 +30,8 @@ SIMPLE_SERVICE_CONFIG_URL = urlresolvers.reverse(
     'horizon:infrastructure:parameters:simple_service_configuration')
 ADVANCED_SERVICE_CONFIG_URL = urlresolvers.reverse(
     'horizon:infrastructure:parameters:advanced_service_configuration')
+FIELDSET_URL = urlresolvers.reverse(
+    'horizon:infrastructure:parameters:fieldset', args=('compute',))
 
 TEST_DATA = utils.TestDataContainer()
 tuskar_data.data(TEST_DATA)
@@ -51,6 +54,37 @@ class ParametersTest(test.BaseAdminViewTests):
             res = self.client.get(INDEX_URL)
 
         self.assertTemplateUsed(res, 'infrastructure/parameters/index.html')
+        # Only the global parameters are rendered with the page.
+        self.assertTrue(all('::' not in name
+                            for name in res.context['form'].fields))
+        self.assertEqual([fieldset for (fieldset, url)
+                          in res.context['fieldsets']],
+                         ['controller', 'compute', 'block-storage',
+                          'object-storage', 'ceph-storage'])
+
+    def test_fieldset(self):
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first())
+        with patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
+                   return_value=plan), patch.object(
+                plan, 'parameter_list',
+                wraps=plan.parameter_list) as parameter_list:
+            res = self.client.get(FIELDSET_URL)
+            self.assertTemplateUsed(
+                res, 'infrastructure/parameters/_fieldset.html')
+            fields = res.context['form'].fields
+            self.assertTrue(fields)
+            self.assertTrue(all(name.startswith('Compute-1::')
+                                for name in fields))
+            # Only the parameters of the fieldset are loaded as initial
+            # values, the full list is at most used to compile the fields.
+            self.assertTrue(all(name.startswith('Compute-1::')
+                                for name in res.context['form'].initial))
+            self.assertLessEqual(parameter_list.call_count, 1)
+
+            res = self.client.get(urlresolvers.reverse(
+                'horizon:infrastructure:parameters:fieldset',
+                args=('unknown',)))
+            self.assertEqual(res.status_code, 404)
 
     def test_simple_service_config_get(self):
         plan = api.tuskar.Plan(self.tuskarclient_plans.first())
@@ -65,6 +99,18 @@ class ParametersTest(test.BaseAdminViewTests):
             self.assertTemplateUsed(
                 res, 'infrastructure/parameters/simple_service_config.html')
 
+    def test_advanced_service_config_get(self):
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first())
+        plan.role_list = [api.tuskar.Role(role)
+                          for role in self.tuskarclient_roles.list()]
+        with patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
+                   return_value=plan):
+            res = self.client.get(ADVANCED_SERVICE_CONFIG_URL)
+
+        self.assertTemplateUsed(
+            res, 'infrastructure/parameters/advanced_service_config.html')
+        self.assertNotIn('fieldsets', res.context)
+
     def test_advanced_service_config_post(self):
         plan = api.tuskar.Plan(self.tuskarclient_plans.first())
         roles = [api.tuskar.Role(role)
@@ -73,22 +119,50 @@ class ParametersTest(test.BaseAdminViewTests):
                       for p in plan.parameters]
 
         data = {p.name: unicode(p.value) for p in parameters}
+        data['Compute-1::ExtraConfig'] = u'{"debug": true}'
+        plan.role_list = roles
 
         with contextlib.nested(
             patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
                   return_value=plan),
-            patch('tuskar_ui.api.tuskar.Plan.role_list',
-                  return_value=roles),
             patch('tuskar_ui.api.tuskar.Plan.parameter_list',
                   return_value=parameters),
             patch('tuskar_ui.api.tuskar.Plan.patch',
                   return_value=plan),
-        ) as (get_the_plan, role_list, parameter_list, plan_patch):
+        ) as (get_the_plan, parameter_list, plan_patch):
             res = self.client.post(ADVANCED_SERVICE_CONFIG_URL, data)
 
         self.assertRedirectsNoFollow(res, INDEX_URL)
 
-        plan_patch.assert_called_once_with(ANY, plan.uuid, data)
+        # Only the changed parameter is sent, along with the same parameter
+        # of the other roles.
+        plan_patch.assert_called_once_with(ANY, plan.uuid, {
+            'Controller-1::ExtraConfig': u'{"debug": true}',
+            'Compute-1::ExtraConfig': u'{"debug": true}',
+            'Block Storage-1::ExtraConfig': u'{"debug": true}',
+            'Object Storage-1::ExtraConfig': u'{"debug": true}'})
+
+    def test_advanced_service_config_post_unchanged(self):
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first())
+        plan.role_list = [api.tuskar.Role(role)
+                          for role in self.tuskarclient_roles.list()]
+        parameters = [api.tuskar.Parameter(p, plan=plan)
+                      for p in plan.parameters]
+
+        data = {p.name: unicode(p.value) for p in parameters}
+
+        with contextlib.nested(
+            patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
+                  return_value=plan),
+            patch('tuskar_ui.api.tuskar.Plan.parameter_list',
+                  return_value=parameters),
+            patch('tuskar_ui.api.tuskar.Plan.patch',
+                  return_value=plan),
+        ) as (get_the_plan, parameter_list, plan_patch):
+            res = self.client.post(ADVANCED_SERVICE_CONFIG_URL, data)
+
+        self.assertRedirectsNoFollow(res, INDEX_URL)
+        self.assertFalse(plan_patch.called)
 
     def test_simple_service_config_post(self):
         plan = api.tuskar.Plan(self.tuskarclient_plans.first())
@@ -123,8 +197,31 @@ class ParametersTest(test.BaseAdminViewTests):
             'Controller-1::CinderISCSIHelper': u'lioadm',
             'Controller-1::NovaComputeLibvirtType': u'qemu',
             'Compute-1::SnmpdReadonlyUserPassword': u'password',
-            'Controller-1::NtpServer': u'',
-            'Controller-1::ExtraConfig': u'{}',
-            'Compute-1::ExtraConfig': u'{}',
-            'Block Storage-1::ExtraConfig': u'{}',
-            'Object Storage-1::ExtraConfig': u'{}'})
+            'Controller-1::NtpServer': u''})
+
+    def test_parameter_fields_cached(self):
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first())
+        parameters = [api.tuskar.Parameter(p, plan=plan)
+                      for p in plan.parameters]
+
+        with contextlib.nested(
+            patch('tuskar_ui.api.tuskar.Plan.get_the_plan',
+                  return_value=plan),
+            patch('tuskar_ui.api.tuskar.Plan.parameter_list',
+                  return_value=parameters),
+            patch('tuskar_ui.infrastructure.parameters.forms.'
+                  '_compile_field_specs',
+                  side_effect=forms._compile_field_specs),
+        ) as (get_the_plan, parameter_list, compile_field_specs):
+            first = forms.parameter_fields(None)
+            second = forms.parameter_fields(None, prefix='Compute-1::')
+
+        self.assertEqual(compile_field_specs.call_count, 1)
+        self.assertEqual(first.keys(), [p.name for p in parameters])
+        self.assertEqual(second.keys(), [p.name for p in parameters
+                                         if p.name.startswith('Compute-1::')])
+        for name, field in second.items():
+            # The fields are made anew, but their classes only once.
+            self.assertIsNot(field, first[name])
+            self.assertIs(type(field), type(first[name]))
+            self.assertEqual(field.initial, field.parameter.value)
@@ -26,4 +26,7 @@ urlpatterns = urls.patterns(
     urls.url(r'^advanced-service-config$',
              views.AdvancedServiceConfigView.as_view(),
              name='advanced_service_configuration'),
+    urls.url(r'^fieldset/(?P<fieldset>[\w-]+)$',
+             views.FieldsetView.as_view(),
+             name='fieldset'),
 )
@@ -14,6 +14,7 @@
 
 from django.core.urlresolvers import reverse
 from django.core.urlresolvers import reverse_lazy
+from django import http
 from django.utils.translation import ugettext_lazy as _
 import horizon.forms
 import horizon.tables
@@ -63,6 +64,13 @@ class IndexView(horizon.forms.ModalFormView):
     form_class = forms.ServiceConfig
     form_id = "service_config"
     template_name = "infrastructure/parameters/index.html"
+    # The other fieldsets are loaded when their tabs are shown.
+    fieldset = 'global'
+
+    def get_form_kwargs(self):
+        kwargs = super(IndexView, self).get_form_kwargs()
+        kwargs['fieldset'] = self.fieldset
+        return kwargs
 
     def get_initial(self):
         self.plan = api.tuskar.Plan.get_the_plan(self.request)
@@ -88,12 +96,38 @@ class IndexView(horizon.forms.ModalFormView):
         }
         context['header_actions'] = [advanced_edit_action,
                                      simplified_edit_action]
+        context['fieldsets'] = [
+            (fieldset, reverse('horizon:infrastructure:parameters:fieldset',
+                               kwargs={'fieldset': fieldset}))
+            for fieldset in forms.FIELDSETS if fieldset != self.fieldset]
         return context
 
 
+class FieldsetView(IndexView):
+    """Renders the fields of a single fieldset of the service configuration.
+    """
+    template_name = "infrastructure/parameters/_fieldset.html"
+    ajax_template_name = template_name
+
+    @property
+    def fieldset(self):
+        fieldset = self.kwargs['fieldset']
+        if fieldset not in forms.FIELDSETS:
+            raise http.Http404
+        return fieldset
+
+    def get_initial(self):
+        self.plan = api.tuskar.Plan.get_the_plan(self.request)
+        self.parameters = self.plan.parameter_group(
+            forms.FIELDSETS[self.fieldset] or '')
+        return {p.name: p.value for p in self.parameters}
+
+
 class AdvancedServiceConfigView(IndexView):
     form_class = forms.AdvancedEditServiceConfig
     form_id = "advanced_service_config"
+    # All the fields are posted, so they are all rendered at once.
+    fieldset = None
     success_url = reverse_lazy('horizon:infrastructure:parameters:index')
     submit_label = _("Save Configuration")
     submit_url = reverse_lazy('horizon:infrastructure:parameters:'
@@ -104,4 +138,6 @@ class AdvancedServiceConfigView(IndexView):
         context = super(AdvancedServiceConfigView,
                         self) .get_context_data(**kwargs)
         context['header_actions'] = []
+        # All the fields are rendered at once, there are no tabs to load.
+        del context['fieldsets']
         return context
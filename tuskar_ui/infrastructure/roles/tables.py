@@ -39,9 +39,9 @@ class RolesTable(tables.DataTable):
     name = tables.Column('name',
                          link="horizon:infrastructure:roles:detail",
                          verbose_name=_("Role"))
-    flavor = tables.Column('flavor',
+    flavor = tables.Column('flavor_name',
                            verbose_name=_("Flavor"))
-    image = tables.Column('image',
+    image = tables.Column('image_name',
                           verbose_name=_("Image"))
 
     def get_object_id(self, datum):
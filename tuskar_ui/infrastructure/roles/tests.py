@@ -16,7 +16,8 @@ import contextlib
 
 from django.core import urlresolvers
 from openstack_dashboard.test.test_data import utils
-from mock import patch, call  # noqa
+import mock
+from mock import patch, call, ANY  # noqa
 
 from tuskar_ui import api
 from tuskar_ui.test import helpers as test
@@ -32,6 +33,7 @@ DETAIL_URL = urlresolvers.reverse(
     'horizon:infrastructure:roles:detail', args=('role-1',))
 UPDATE_URL = urlresolvers.reverse(
     'horizon:infrastructure:roles:update', args=('role-1',))
+IRONIC_NODE_MANAGER = 'tuskar_ui.api.node.ironicclient.return_value.node'
 
 TEST_DATA = utils.TestDataContainer()
 flavor_data.data(TEST_DATA)
@@ -48,18 +50,25 @@ class RolesTest(test.BaseAdminViewTests):
         plans = [api.tuskar.Plan(plan)
                  for plan in self.tuskarclient_plans.list()]
         flavor = self.novaclient_flavors.first()
-        image = self.glanceclient_images.first()
+        images = self.glanceclient_images.list()
 
         with contextlib.nested(
             patch('tuskar_ui.api.tuskar.Plan.list',
                   return_value=plans),
             patch('tuskar_ui.api.tuskar.Role.list',
                   return_value=roles),
+            patch('openstack_dashboard.api.glance.image_list_detailed',
+                  return_value=[images]),
             patch('openstack_dashboard.api.glance.image_get',
-                  return_value=image),
-            patch('tuskar_ui.api.flavor.Flavor.get_by_name',
-                  return_value=flavor)):
+                  return_value=images[0]),
+            patch('tuskar_ui.api.flavor.Flavor.list',
+                  return_value=[flavor])) as mocks:
             res = self.client.get(INDEX_URL)
+            # All the role images are resolved with one listing call, and
+            # all the flavors with another one.
+            self.assertEqual(mocks[2].call_count, 1)
+            self.assertEqual(mocks[3].call_count, 0)
+            self.assertEqual(mocks[4].call_count, 1)
 
         self.assertTemplateUsed(res, 'infrastructure/roles/index.html')
 
@@ -71,6 +80,13 @@ class RolesTest(test.BaseAdminViewTests):
         flavor = self.novaclient_flavors.first()
         image = self.glanceclient_images.first()
         stack = api.heat.Stack(TEST_DATA.heatclient_stacks.first())
+        nodes = self.ironicclient_nodes.list()
+        nested = {
+            'Controller-group': [mock.Mock(physical_resource_id='c-stack')],
+            'c-stack': [resource
+                        for resource in self.heatclient_resources.list()
+                        if resource.resource_name == 'Controller'],
+        }
 
         with contextlib.nested(
             patch('tuskar_ui.api.tuskar.Role.list',
@@ -79,18 +95,44 @@ class RolesTest(test.BaseAdminViewTests):
                   return_value=stack),
             patch('tuskar_ui.api.heat.Stack.events',
                   return_value=[]),
-            patch('tuskar_ui.api.heat.Stack.resources',
-                  return_value=[]),
             patch('tuskar_ui.api.tuskar.Plan.list',
                   return_value=plans),
-            patch('openstack_dashboard.api.glance.image_get',
-                  return_value=image),
-            patch('tuskar_ui.api.flavor.Flavor.get_by_name',
-                  return_value=flavor)):
-            res = self.client.get(DETAIL_URL)
+            patch('openstack_dashboard.api.glance.image_list_detailed',
+                  return_value=[[image]]),
+            patch('tuskar_ui.api.flavor.Flavor.list',
+                  return_value=[flavor]),
+            # Only the clients are mocked, so that the budget covers the
+            # calls made by the real Stack.resources and Node.list.
+            patch('openstack_dashboard.api.heat.resource_get',
+                  side_effect=lambda request, stack_id, name: mock.Mock(
+                      physical_resource_id=name + '-group')),
+            patch('openstack_dashboard.api.heat.resources_list',
+                  side_effect=lambda request, stack_id: nested[stack_id]),
+            patch('tuskar_ui.api.node.ironicclient', **{
+                'return_value.node.list.return_value': nodes,
+            }),
+            patch('openstack_dashboard.api.nova.server_list',
+                  return_value=(self.novaclient_servers.list(), False)),
+            patch('openstack_dashboard.api.nova.server_get')):
+            # The resources of the role are retrieved once, with a call per
+            # nested stack, and joined with the nodes of a single listing.
+            with self.assertCallBudget({
+                'openstack_dashboard.api.heat.resource_get': 1,
+                'openstack_dashboard.api.heat.resources_list': 2,
+                IRONIC_NODE_MANAGER + '.list': 1,
+                IRONIC_NODE_MANAGER + '.get': 0,
+                'openstack_dashboard.api.nova.server_get': 0,
+                'openstack_dashboard.api.glance.image_list_detailed': 1,
+                'openstack_dashboard.api.glance.image_get': 0,
+            }):
+                res = self.client.get(DETAIL_URL)
 
         self.assertTemplateUsed(
             res, 'infrastructure/roles/detail.html')
+        self.assertEqual(res.context['flavor'], flavor)
+        self.assertEqual([node.uuid for node in res.context['nodes']],
+                         [node.uuid for node in nodes
+                          if node.instance_uuid == 'bb'])
 
     def test_update_get(self):
         roles = [api.tuskar.Role(role)
@@ -108,8 +150,8 @@ class RolesTest(test.BaseAdminViewTests):
                   return_value=stack),
             patch('tuskar_ui.api.heat.Stack.events',
                   return_value=[]),
-            patch('tuskar_ui.api.heat.Stack.resources',
-                  return_value=[]),
+            patch('tuskar_ui.api.heat.Stack.role_node_count',
+                  return_value=1),
             patch('tuskar_ui.api.tuskar.Plan.list',
                   return_value=plans),
             patch('openstack_dashboard.api.glance.image_get',
@@ -117,9 +159,15 @@ class RolesTest(test.BaseAdminViewTests):
             patch('tuskar_ui.api.flavor.Flavor.list',
                   return_value=flavors),
             patch('openstack_dashboard.api.glance.image_list_detailed',
-                  return_value=[images])):
+                  return_value=[images]),
+            patch('tuskar_ui.api.node.Node.count',
+                  return_value=2)) as mocks:
 
             res = self.client.get(UPDATE_URL)
+            # The nodes are only counted, not retrieved.
+            self.assertEqual(mocks[3].call_count, 1)
+            self.assertEqual(mocks[8].call_args_list, [
+                call(ANY, associated=False, maintenance=False)])
 
             # Check that the expected fields are in the form:
             self.assertIn('id="id_flavor" name="flavor"', res.content)
@@ -17,7 +17,6 @@ from django.core.urlresolvers import reverse
 from django import http
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic import base
-from glanceclient import exc as glance_exc
 from horizon import tables as horizon_tables
 from horizon import utils
 from horizon import workflows
@@ -39,24 +38,18 @@ class IndexView(views.ItemCountMixin, horizon_tables.DataTableView):
 
     @utils.memoized.memoized
     def get_data(self):
-        roles = api.tuskar.Role.list(self.request)
-        plan = api.tuskar.Plan.get_the_plan(self.request)
-        for role in roles:
-            role_flavor = role.flavor(plan)
-            try:
-                role_image = role.image(plan)
-            except glance_exc.HTTPNotFound:
-                # Glance returns a 404 if the image doesn't exist
-                role_image = None
+        roles = []
+        catalog = api.tuskar.Role.catalog(self.request)
+        for role, role_flavor, role_image in catalog.values():
             if role_flavor:
-                role.flavor = role_flavor.name
+                role.flavor_name = role_flavor.name
             else:
-                role.flavor = _('Unknown')
+                role.flavor_name = _('Unknown')
             if role_image:
-                role.image = role_image.name
+                role.image_name = role_image.name
             else:
-                role.image = _('Unknown')
-
+                role.image_name = _('Unknown')
+            roles.append(role)
         return roles
 
 
@@ -68,17 +61,15 @@ class DetailView(horizon_tables.DataTableView, views.RoleMixin,
     @utils.memoized.memoized
     def _get_nodes(self, stack, role):
         resources = stack.resources(role=role, with_joins=True)
-        nodes = [r.node for r in resources]
-        for node in nodes:
-            try:
-                resource = api.heat.Resource.get_by_node(self.request, node)
-            except LookupError:
-                node.role_name = '-'
-            else:
-                node.role_name = resource.role.name
-                node.role_id = resource.role.id
-                node.stack_id = resource.stack.id
-
+        nodes = []
+        # The joined resources already know their role and stack, there is
+        # no need to look them up again for every node.
+        for resource in resources:
+            node = resource.node
+            node.role_name = resource.role.name
+            node.role_id = resource.role.id
+            node.stack_id = resource.stack.id
+            nodes.append(node)
         return nodes
 
     def get_data(self):
@@ -93,7 +84,6 @@ class DetailView(horizon_tables.DataTableView, views.RoleMixin,
         context = super(DetailView, self).get_context_data(**kwargs)
         redirect = reverse(INDEX_URL)
 
-        plan = api.tuskar.Plan.get_the_plan(self.request)
         stack = self.get_stack()
         role = self.get_role(redirect)
 
@@ -102,8 +92,10 @@ class DetailView(horizon_tables.DataTableView, views.RoleMixin,
             context['nodes'] = self._get_nodes(stack, role)
         else:
             context['nodes'] = []
-        context['flavor'] = role.flavor(plan)
-        context['image'] = role.image(plan)
+        joined_role = api.tuskar.Role.catalog(self.request).get(
+            role.id, api.tuskar.RoleJoin(role, None, None))
+        context['flavor'] = joined_role.flavor
+        context['image'] = joined_role.image
 
         if stack:
             if api_base.is_service_enabled(self.request, 'metering'):
@@ -134,8 +126,7 @@ class UpdateView(workflows.WorkflowView, views.StackMixin, views.RoleMixin):
 
         stack = self.get_stack()
         if stack:
-            resources = stack.resources(role=role, with_joins=True)
-            role_nodes = len(resources)
+            role_nodes = stack.role_node_count(role)
         else:
             role_nodes = 0
 
@@ -145,8 +136,8 @@ class UpdateView(workflows.WorkflowView, views.StackMixin, views.RoleMixin):
         role_image = role.image(plan)
         role_image = '' if role_image is None else role_image.id
 
-        free_nodes = len(api.node.Node.list(self.request, associated=False,
-                                            maintenance=False))
+        free_nodes = api.node.Node.count(self.request, associated=False,
+                                         maintenance=False)
         available_nodes = role_nodes + free_nodes
 
         return {
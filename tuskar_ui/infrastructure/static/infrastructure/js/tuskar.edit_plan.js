@@ -4,6 +4,10 @@ tuskar.edit_plan = (function () {
     var module = {};
 
     module.debounce_timer = null;
+    module.sequence = 0;
+    module.saving = false;
+    module.save_pending = false;
+    module.saved_counts = {};
     module.ICON_CLASSES = (
 	'fa-spinner ' + 
 	'fa-spin ' +
@@ -19,6 +23,7 @@ tuskar.edit_plan = (function () {
         $('form.deployment-roles-form input.number-picker'
             ).change(module.on_change);
         $('form.deployment-roles-form [type=submit]').hide();
+        module.saved_counts = module.get_counts();
         // Compile the templates.
         module.message_template = Hogan.compile(
             $('#message-template').html() || '');
@@ -32,18 +37,60 @@ tuskar.edit_plan = (function () {
         module.debounce_timer = window.setTimeout(module.save_form, 500);
     };
 
+    module.get_counts = function () {
+        var counts = {};
+        $('form.deployment-roles-form input.number-picker').each(function () {
+            counts[this.name] = this.value;
+        });
+        return counts;
+    };
+
     module.save_form = function () {
-        // Save the current plan and get validation results.
+        // Only one save is sent at a time, the changes made in the meantime
+        // are saved once it is answered.
+        if (module.saving) {
+            module.save_pending = true;
+            return;
+        }
+        module.saving = true;
+        module.save_pending = false;
+        // Save the changed counts and get validation results.
         var $form = $('form.deployment-roles-form');
+        var counts = module.get_counts();
+        var changed = {};
+        $.each(counts, function (name, count) {
+            if (module.saved_counts[name] !== count) {
+                changed[name] = count;
+            }
+        });
+        // Only the response to the latest save is shown.
+        var sequence = ++module.sequence;
         module.update_messages(null);
         $.ajax({
           type: 'POST',
-          headers: {'X-Horizon-Validate': 'true'},
-          url: $form.attr('action'),
-          data: $form.serialize(),
+          url: $form.data('autosave-url'),
+          data: {
+            csrfmiddlewaretoken: $form.find(
+                'input[name=csrfmiddlewaretoken]').val(),
+            sequence: sequence,
+            counts: JSON.stringify(changed)
+          },
           dataType: 'json',
           async: true,
-          success: module.update_messages,
+          success: function (data) {
+            if (data.saved) {
+                $.extend(module.saved_counts, changed);
+            }
+            if (!module.save_pending && data.sequence === module.sequence) {
+                module.update_messages(data);
+            }
+          },
+          complete: function () {
+            module.saving = false;
+            if (module.save_pending) {
+                module.save_form();
+            }
+          }
         });
     };
 
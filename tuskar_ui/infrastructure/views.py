@@ -12,9 +12,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from django.views.generic import base
 from horizon.utils import memoized
 
 from tuskar_ui import api
+from tuskar_ui.utils import metrics
 
 
 class ItemCountMixin(object):
@@ -44,3 +46,10 @@ class RoleMixin(object):
         role = api.tuskar.Role.get(self.request, role_id,
                                    _error_redirect=redirect)
         return role
+
+
+class MetricsView(base.View):
+    """Serves the metrics to be scraped by Prometheus."""
+
+    def get(self, request, *args, **kwargs):
+        return metrics.scrape_response()
@@ -13,6 +13,8 @@
 
 from __future__ import absolute_import
 
+import copy
+
 from django.utils import unittest
 from heatclient.v1 import events
 import mock
@@ -38,9 +40,28 @@ class HeatAPITests(test.APITestCase):
         stack = self.heatclient_stacks.first()
 
         with patch('openstack_dashboard.api.heat.stack_get',
-                   return_value=stack):
+                   return_value=stack) as stack_get:
             ret_val = api.heat.Stack.get(self.request, stack.id)
+            cached = api.heat.Stack.get(self.request, stack.id)
         self.assertIsInstance(ret_val, api.heat.Stack)
+        self.assertEqual(stack_get.call_count, 1)
+        # Only the data of the stack is cached, not its client.
+        self.assertIsNone(cached._apiresource.manager)
+        self.assertEqual(cached.stack_name, stack.stack_name)
+
+    def test_stack_get_by_plan(self):
+        stack = self.heatclient_stacks.first()
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first())
+
+        with patch('openstack_dashboard.api.heat.stacks_list',
+                   return_value=([stack], None, None)) as stacks_list, patch(
+                'openstack_dashboard.api.heat.stack_get',
+                return_value=stack) as stack_get:
+            for i in range(2):
+                ret_val = api.heat.Stack.get_by_plan(self.request, plan)
+                self.assertEqual(ret_val.id, stack.id)
+        self.assertEqual(stacks_list.call_count, 1)
+        self.assertEqual(stack_get.call_count, 1)
 
     def test_stack_plan(self):
         stack = api.heat.Stack(self.heatclient_stacks.first(),
@@ -63,6 +84,111 @@ class HeatAPITests(test.APITestCase):
             self.assertIsInstance(e, events.Event)
         self.assertEqual(8, len(ret_val))
 
+    def test_stack_events_page(self):
+        event_list = self.heatclient_events.list()
+        stack = api.heat.Stack(self.heatclient_stacks.first())
+
+        with patch('openstack_dashboard.api.heat.heatclient') as heatclient:
+            heatclient.return_value.events.list.return_value = event_list[:4]
+            events, has_more_data = stack.events_page(
+                marker=2, limit=3,
+                filters={'resource_status': 'COMPLETE'})
+
+        heatclient.return_value.events.list.assert_called_once_with(
+            stack.stack_name, marker=2, limit=4,
+            filters={'resource_status': 'COMPLETE'})
+        self.assertEqual(event_list[:3], events)
+        self.assertTrue(has_more_data)
+
+    def test_stack_iter_events(self):
+        event_list = self.heatclient_events.list()
+        stack = api.heat.Stack(self.heatclient_stacks.first())
+
+        with patch('openstack_dashboard.api.heat.heatclient') as heatclient:
+            heatclient.return_value.events.list.side_effect = [
+                event_list[:4], event_list[3:7], event_list[6:]]
+            events = list(stack.iter_events(page_size=3))
+
+        self.assertEqual(event_list, events)
+        self.assertEqual(
+            [mock.call(stack.stack_name, marker=None, limit=4, filters={}),
+             mock.call(stack.stack_name, marker=3, limit=4, filters={}),
+             mock.call(stack.stack_name, marker=6, limit=4, filters={})],
+            heatclient.return_value.events.list.call_args_list)
+
+    def test_stack_last_events(self):
+        event_list = self.heatclient_events.list()
+        failed = events.Event(None, {
+            'id': 9,
+            'resource_name': 'Compute1',
+            'resource_status': 'UPDATE_FAILED',
+            'resource_status_reason': 'timed out',
+            'event_time': '2014-01-01T07:30:00Z'}, loaded=True)
+        stack = self.heatclient_stacks.first()
+
+        with patch('openstack_dashboard.api.heat.heatclient') as heatclient:
+            events_list = heatclient.return_value.events.list
+            events_list.side_effect = [[event_list[-1]], []]
+            failed_events, last_event = api.heat.Stack(
+                stack, request=self.request).last_events
+            self.assertEqual([], failed_events)
+            self.assertEqual(8, last_event.id)
+            self.assertEqual(events_list.call_args_list, [
+                mock.call(stack.stack_name, marker=None, limit=2,
+                          sort_keys='event_time', sort_dir='desc', filters={}),
+                mock.call(stack.stack_name, marker=None, limit=10,
+                          sort_keys='event_time', sort_dir='desc',
+                          filters={'resource_status': 'FAILED'}),
+            ])
+
+            # Later on, only the newer events are fetched.
+            events_list.reset_mock()
+            events_list.side_effect = [[failed]]
+            failed_events, last_event = api.heat.Stack(
+                stack, request=self.request).last_events
+            events_list.assert_called_once_with(
+                stack.stack_name, marker=8, limit=101,
+                sort_keys='event_time', sort_dir='asc', filters={})
+            self.assertEqual([9], [event.id for event in failed_events])
+            self.assertEqual(9, last_event.id)
+
+    def test_process_templates(self):
+        templates = {
+            'plan.yaml': 'heat_template_version: 2013-05-23\n'
+                         'resources:\n'
+                         '  Compute:\n'
+                         '    type: OS::TripleO::Compute\n',
+            'environment.yaml': 'resource_registry:\n'
+                                '  OS::TripleO::Compute: '
+                                'puppet/compute.yaml\n',
+            'puppet/compute.yaml': 'heat_template_version: 2013-05-23\n'
+                                   'resources:\n'
+                                   '  Config:\n'
+                                   '    type: OS::Heat::SoftwareConfig\n'
+                                   '    properties:\n'
+                                   '      config:\n'
+                                   '        get_file: ../scripts/run.sh\n',
+            'scripts/run.sh': '#!/bin/sh\n',
+        }
+        compute_url = 'file:///tuskar/templates/puppet/compute.yaml'
+        script_url = 'file:///tuskar/templates/scripts/run.sh'
+
+        with patch('heatclient.common.template_format.parse',
+                   wraps=api.heat.template_format.parse) as parse:
+            for i in range(2):
+                template, environment, files = api.heat._process_templates(
+                    templates)
+                self.assertEqual(
+                    'OS::TripleO::Compute',
+                    template['resources']['Compute']['type'])
+                self.assertEqual(
+                    compute_url,
+                    environment['resource_registry']['OS::TripleO::Compute'])
+                self.assertEqual('#!/bin/sh\n', files[script_url])
+                self.assertIn(script_url, files[compute_url])
+        # The second time around, the processed templates are reused.
+        self.assertEqual(3, parse.call_count)
+
     def test_stack_is_deployed(self):
         stack = api.heat.Stack(self.heatclient_stacks.first())
         ret_val = stack.is_deployed
@@ -101,14 +227,104 @@ class HeatAPITests(test.APITestCase):
             self.assertIsInstance(i, api.heat.Resource)
         self.assertEqual(4, len(ret_val))
 
+    def test_stack_resources_index(self):
+        stack = api.heat.Stack(self.heatclient_stacks.first(),
+                               request=self.request)
+        roles = [api.tuskar.Role(role)
+                 for role in self.tuskarclient_roles.list()][:2]
+        stack.plan = mock.Mock(role_list=roles)
+        nested = {
+            'Controller-group': [mock.Mock(physical_resource_id='c-stack')],
+            'c-stack': [mock.Mock(physical_resource_id='instance-1')],
+            'Compute-group': [mock.Mock(physical_resource_id='n-stack')],
+            'n-stack': [mock.Mock(physical_resource_id='instance-2')],
+        }
+        node = api.node.Node(mock.Mock(uuid='node-1',
+                                       instance_uuid='instance-1'))
+
+        with patch('openstack_dashboard.api.heat.resource_get',
+                   side_effect=lambda request, stack_id, name: mock.Mock(
+                       physical_resource_id=name + '-group'),
+                   ) as resource_get, patch(
+                'openstack_dashboard.api.heat.resources_list',
+                side_effect=lambda request, stack_id: nested[stack_id],
+        ) as resources_list, patch('tuskar_ui.api.node.Node.list',
+                                   return_value=[node]) as node_list:
+            self.assertEqual(len(stack.resources(role=roles[0])), 1)
+            self.assertEqual(len(stack.resources(role=roles[1])), 0)
+            self.assertEqual(
+                len(stack.resources(role=roles[1], with_joins=False)), 1)
+            self.assertEqual(
+                len(stack.resources(roles=roles, with_joins=False)), 2)
+            self.assertEqual(stack.resources_count(), 1)
+            self.assertEqual(stack.resources_count(roles[0]), 1)
+            resource = stack.resources(role=roles[0])[0]
+            self.assertEqual(resource.node, node)
+            self.assertEqual(resource.role, roles[0])
+
+        self.assertEqual(resource_get.call_count, 2)
+        self.assertEqual(resources_list.call_count, 4)
+        self.assertEqual(node_list.call_count, 1)
+
+    def test_stack_role_node_count(self):
+        stack = api.heat.Stack(self.heatclient_stacks.first(),
+                               request=self.request)
+        roles = [api.tuskar.Role(role)
+                 for role in self.tuskarclient_roles.list()][:2]
+        nested = {
+            'Controller-group': [mock.Mock(physical_resource_id='c-stack')],
+            'c-stack': [mock.Mock(physical_resource_id='instance-1')],
+            'Compute-group': [mock.Mock(physical_resource_id='n-stack')],
+            'n-stack': [mock.Mock(physical_resource_id='instance-2')],
+        }
+
+        with patch('openstack_dashboard.api.heat.resource_get',
+                   side_effect=lambda request, stack_id, name: mock.Mock(
+                       physical_resource_id=name + '-group'),
+                   ), patch(
+                'openstack_dashboard.api.heat.resources_list',
+                side_effect=lambda request, stack_id: nested[stack_id],
+        ), patch('tuskar_ui.api.node.Node.instance_uuids',
+                 return_value=frozenset(['instance-1'])) as instance_uuids:
+            with patch('tuskar_ui.api.node.Node.list') as node_list:
+                self.assertEqual(stack.role_node_count(roles[0]), 1)
+                self.assertEqual(stack.role_node_count(roles[1]), 0)
+
+        # The nodes themselves are never retrieved.
+        self.assertEqual(instance_uuids.call_count, 1)
+        self.assertFalse(node_list.called)
+
+    def test_resource_get_by_node_cached(self):
+        stack = api.heat.Stack(self.heatclient_stacks.first())
+        role = api.tuskar.Role(self.tuskarclient_roles.first())
+        resource = api.heat.Resource(self.heatclient_resources.first(),
+                                     role=role)
+        node = mock.Mock(instance_uuid='aa')
+
+        with patch('tuskar_ui.api.heat.Stack.list',
+                   return_value=[stack]), patch(
+                'tuskar_ui.api.heat.Stack.resources',
+                return_value=[resource]) as resources:
+            # The second request is answered from the index of the stack.
+            for request in (self.request, copy.copy(self.request)):
+                ret_val = api.heat.Resource.get_by_node(request, node)
+                self.assertEqual(ret_val.resource_name, 'Compute0')
+                self.assertEqual(ret_val.role.id, role.id)
+                self.assertEqual(ret_val.stack, stack)
+                # Neither the resource nor its role bring a client along.
+                self.assertIsNone(ret_val._apiresource.manager)
+                self.assertIsNone(ret_val.role._apiresource.manager)
+        self.assertEqual(resources.call_count, 1)
+
     def test_stack_keystone_ip(self):
         stack = api.heat.Stack(self.heatclient_stacks.first())
 
         self.assertEqual('192.0.2.23', stack.keystone_ip)
 
     def test_stack_dashboard_url(self):
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first())
         stack = api.heat.Stack(self.heatclient_stacks.first())
-        stack.plan = api.tuskar.Plan(self.tuskarclient_plans.first())
+        stack.plan = plan
 
         mocked_service = mock.Mock(id='horizon_id')
         mocked_service.name = 'horizon'
@@ -132,3 +348,32 @@ class HeatAPITests(test.APITestCase):
             self.assertEqual(['http://192.0.2.23:/admin'],
                              stack.dashboard_urls)
             self.assertEqual(client_get.call_count, 1)
+
+            # The next request gets them from the cache.
+            stack = api.heat.Stack(self.heatclient_stacks.first())
+            stack.plan = plan
+            self.assertEqual(['http://192.0.2.23:/admin'],
+                             stack.dashboard_urls)
+            self.assertEqual(client_get.call_count, 1)
+            self.assertEqual(services_obj.list.call_count, 1)
+
+            # They are looked up again once the admin password changes,
+            # with a client of that request.
+            stack = api.heat.Stack(self.heatclient_stacks.first())
+            stack.plan = mock.Mock(**{'parameter_value.return_value': 'new'})
+            self.assertEqual(['http://192.0.2.23:/admin'],
+                             stack.dashboard_urls)
+            self.assertEqual(client_get.call_count, 2)
+            self.assertEqual(client_get.call_args[0][2], 'new')
+
+    def test_stack_dashboard_url_unreachable(self):
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first())
+
+        with patch('tuskar_ui.api.heat.overcloud_keystoneclient',
+                   side_effect=Exception('timed out')) as client_get:
+            for i in range(2):
+                stack = api.heat.Stack(self.heatclient_stacks.first())
+                stack.plan = plan
+                self.assertEqual([], stack.dashboard_urls)
+                self.assertFalse(stack.is_initialized)
+        self.assertEqual(client_get.call_count, 1)
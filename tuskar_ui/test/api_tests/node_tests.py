@@ -100,18 +100,58 @@ class NodeAPITests(test.APITestCase):
         with mock_ironicclient(
                 node=node,
                 nodes=nodes
-        ), mock.patch(
+        ) as ironicclient, mock.patch(
             'openstack_dashboard.api.nova.server_list',
             return_value=(instances, None),
         ), mock.patch(
             'openstack_dashboard.api.nova.server_get',
             return_value=instances[0],
-        ):
+        ) as server_get:
             ret_val = api.node.Node.list(self.request)
 
         for node in ret_val:
             self.assertIsInstance(node, api.node.Node)
         self.assertEqual(9, len(ret_val))
+        # The listed nodes are not retrieved again one by one.
+        node_manager = ironicclient.return_value.node
+        node_manager.list.assert_called_once_with(
+            associated=None, maintenance=None, detail=True)
+        self.assertFalse(node_manager.get.called)
+        self.assertFalse(server_get.called)
+        self.assertEqual(ret_val[0].instance, instances[0])
+
+    def test_node_list_unlisted_instance(self):
+        instances = self.novaclient_servers.list()
+        nodes = self.ironicclient_nodes.list()
+
+        with mock_ironicclient(nodes=nodes), mock.patch(
+            'openstack_dashboard.api.nova.server_list',
+            return_value=(instances[1:], None),
+        ), mock.patch(
+            'openstack_dashboard.api.nova.server_get',
+            return_value=instances[0],
+        ) as server_get:
+            ret_val = api.node.Node.list(self.request, associated=True)
+
+        # The instance missing from the server listing is retrieved
+        # directly, instead of being left out of the node.
+        server_get.assert_called_once_with(self.request, instances[0].id)
+        self.assertEqual(ret_val[0].instance, instances[0])
+
+    def test_node_count(self):
+        nodes = self.ironicclient_nodes.list()
+
+        with mock_ironicclient(nodes=nodes) as ironicclient:
+            node_list = ironicclient.return_value.node.list
+            ret_val = api.node.Node.count(self.request, associated=False)
+            self.assertEqual(ret_val, len(nodes))
+            # The count is cached, until a node is deleted.
+            api.node.Node.count(self.request, associated=False)
+            self.assertEqual(node_list.call_count, 1)
+            api.node.Node.delete(self.request, nodes[0].uuid)
+            api.node.Node.count(self.request, associated=False)
+            self.assertEqual(node_list.call_count, 2)
+        node_list.assert_called_with(associated=False, maintenance=None)
 
     def test_node_delete(self):
         node = self.ironicclient_nodes.first()
@@ -159,3 +199,67 @@ class NodeAPITests(test.APITestCase):
         ):
             ret_val = api.node.Node(node).image_name
         self.assertEqual(ret_val, 'overcloud-control')
+
+    def test_image_get_cached(self):
+        image = self.glanceclient_images.first()
+
+        with mock.patch(
+            'openstack_dashboard.api.glance.image_get',
+            return_value=image,
+        ) as image_get:
+            ret_val = api.node.image_get(self.request, image.id)
+            self.assertEqual(ret_val, image)
+            ret_val = api.node.image_get(self.request, image.id)
+            self.assertEqual(ret_val, image)
+        self.assertEqual(image_get.call_count, 1)
+        # The cached image doesn't keep the client of the first request.
+        self.assertIsNone(ret_val.manager)
+        self.assertEqual(ret_val.name, image.name)
+
+    def test_images_get(self):
+        images = self.glanceclient_images.list()
+
+        with mock.patch(
+            'openstack_dashboard.api.glance.image_list_detailed',
+            return_value=[images],
+        ) as image_list, mock.patch(
+            'openstack_dashboard.api.glance.image_get',
+        ) as image_get:
+            ret_val = api.node.images_get(self.request, ['1', '2', None])
+            self.assertEqual(sorted(ret_val.keys()), ['1', '2'])
+            cached = api.node.image_get(self.request, '1')
+        self.assertEqual(image_list.call_count, 1)
+        self.assertEqual(image_get.call_count, 0)
+        # Only the data of the listed images is cached.
+        self.assertEqual(cached, ret_val['1'])
+        self.assertIsNone(cached.manager)
+
+    def test_images_get_fallback(self):
+        image = self.glanceclient_images.first()
+
+        with mock.patch(
+            'openstack_dashboard.api.glance.image_list_detailed',
+            side_effect=Exception,
+        ), mock.patch(
+            'openstack_dashboard.api.glance.image_get',
+            return_value=image,
+        ) as image_get:
+            ret_val = api.node.images_get(self.request, [image.id])
+        self.assertEqual(ret_val, {image.id: image})
+        self.assertEqual(image_get.call_count, 1)
+
+    def test_images_get_not_listed(self):
+        images = self.glanceclient_images.list()
+
+        with mock.patch(
+            'openstack_dashboard.api.glance.image_list_detailed',
+            return_value=[images[:1]],
+        ), mock.patch(
+            'openstack_dashboard.api.glance.image_get',
+            return_value=images[1],
+        ) as image_get:
+            ret_val = api.node.images_get(self.request,
+                                          [images[0].id, images[1].id])
+        self.assertEqual(ret_val, {images[0].id: images[0],
+                                   images[1].id: images[1]})
+        image_get.assert_called_once_with(self.request, images[1].id)
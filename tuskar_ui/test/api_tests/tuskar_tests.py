@@ -66,6 +66,24 @@ class TuskarAPITests(test.APITestCase):
                    return_value=None):
             api.tuskar.Plan.delete(self.request, plan.uuid)
 
+    def test_plan_templates(self):
+        plan = self.tuskarclient_plans.first()
+        templates = {'plan.yaml': 'master', 'environment.yaml': 'env'}
+
+        with patch('tuskarclient.v2.plans.PlanManager.templates',
+                   return_value=templates) as plan_templates:
+            for i in range(2):
+                ret_val = api.tuskar.Plan(plan, request=self.request)
+                self.assertEqual(templates, ret_val.templates)
+            self.assertEqual(1, plan_templates.call_count)
+
+            # Modifying the plan changes its templates.
+            with patch('tuskarclient.v2.plans.PlanManager.patch',
+                       return_value=plan):
+                api.tuskar.Plan.patch(self.request, plan.uuid, {})
+            api.tuskar.Plan(plan, request=self.request).templates
+            self.assertEqual(2, plan_templates.call_count)
+
     def test_plan_role_list(self):
         with patch('tuskarclient.v2.plans.PlanManager.get',
                    return_value=[]):
@@ -73,8 +91,9 @@ class TuskarAPITests(test.APITestCase):
                                    self.request)
 
         with patch('tuskarclient.v2.roles.RoleManager.list',
-                   return_value=self.tuskarclient_roles.list()):
+                   return_value=self.tuskarclient_roles.list()) as role_list:
             ret_val = plan.role_list
+        self.assertEqual(role_list.call_count, 1)
         self.assertEqual(4, len(ret_val))
         for r in ret_val:
             self.assertIsInstance(r, api.tuskar.Role)
@@ -130,6 +149,23 @@ class TuskarAPITests(test.APITestCase):
         self.assertIsInstance(ret_val, api.tuskar.Role)
         self.assertEqual(ret_val.name, 'Controller')
 
+    def test_plan_parameter_group(self):
+        plan = api.tuskar.Plan(self.tuskarclient_plans.first(),
+                               request=self.request)
+        roles = self.tuskarclient_roles.list()
+
+        names = [p.name for p in plan.parameter_group('Compute-1::')]
+        self.assertEqual(names, [p['name'] for p in plan.parameters
+                                 if p['name'].startswith('Compute-1::')])
+        self.assertEqual(plan.parameter_group(), [])
+        self.assertEqual(plan.parameter_group('Unknown-1::'), [])
+
+        with patch('tuskarclient.v2.roles.RoleManager.list',
+                   return_value=roles):
+            role = plan.get_role_by_name('Compute')
+            self.assertEqual([p.name for p in role.parameter_list(plan)],
+                             names)
+
     def test_list_generated_parameters(self):
         plan = api.tuskar.Plan(self.tuskarclient_plans.first())
         with contextlib.nested(
@@ -280,8 +316,7 @@ class TuskarAPITests(test.APITestCase):
              'Controller-1::AdminToken': 'generated_password',
              'Compute-1::SnmpdReadonlyUserPassword': 'generated_password'})
 
-        mock_parameter_list.assert_has_calls([
-            call(), call()])
+        mock_parameter_list.assert_called_once_with()
         mock_make_keystone_certificates.assert_called_once_with({
             'SnmpdReadonlyUserPassword': {
                 'description': 'Snmpd password',
@@ -11,13 +11,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+import importlib
+import inspect
 import os
 import warnings
 
 from django.utils import unittest
+import mock
 from openstack_dashboard.test import helpers
 
 from tuskar_ui.test.test_data import utils
+from tuskar_ui.utils import cache
 
 
 # Silences the warning about with statements.
@@ -30,7 +35,71 @@ def create_stubs(stubs_to_create={}):
     return helpers.create_stubs(stubs_to_create)
 
 
+class _CallCounter(object):
+    """Counts the calls of the method at ``target``, a mock.patch target."""
+
+    def __init__(self, target):
+        self.target = target
+        self.calls = 0
+        self._owner, self._name = self._resolve(target)
+        self._mock = None
+        self._patcher = None
+
+    @staticmethod
+    def _resolve(target):
+        parts = target.split('.')
+        for index in range(len(parts) - 1, 0, -1):
+            try:
+                owner = importlib.import_module('.'.join(parts[:index]))
+            except ImportError:
+                continue
+            break
+        else:
+            raise ValueError("Unable to import %s." % target)
+        for part in parts[index:-1]:
+            owner = getattr(owner, part)
+        return owner, parts[-1]
+
+    def start(self):
+        current = getattr(self._owner, self._name)
+        if isinstance(current, mock.NonCallableMock):
+            # Already patched, the mock counts the calls.
+            self._mock = current
+            self.calls = -current.call_count
+            return
+        if inspect.isclass(self._owner):
+            current = next(klass.__dict__[self._name]
+                           for klass in inspect.getmro(self._owner)
+                           if self._name in klass.__dict__)
+        self._patcher = mock.patch.object(self._owner, self._name,
+                                          self._counted(current))
+        self._patcher.start()
+
+    def stop(self):
+        if self._mock is not None:
+            self.calls += self._mock.call_count
+        else:
+            self._patcher.stop()
+
+    def _counted(self, method):
+        if isinstance(method, (classmethod, staticmethod)):
+            return type(method)(self._counted(method.__func__))
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return method(*args, **kwargs)
+        if inspect.isclass(self._owner) and not inspect.isfunction(method):
+            # Only the functions get bound to the instances.
+            return staticmethod(counted)
+        return counted
+
+
 class TuskarTestsMixin(object):
+    def setUp(self):
+        super(TuskarTestsMixin, self).setUp()
+        # Don't let the cross-request caches leak data between tests.
+        cache.clear_all()
+
     def _setup_test_data(self):
         super(TuskarTestsMixin, self)._setup_test_data()
         utils.load_test_data(self)
@@ -38,6 +107,33 @@ class TuskarTestsMixin(object):
     def add_panel_mocks(self):
         pass
 
+    @contextlib.contextmanager
+    def assertCallBudget(self, budget):
+        """Fail when the API methods are called more often than budgeted
+
+        Counts the calls of the API methods while the block runs, to catch
+        the views calling a backend once for every item instead of once for
+        all of them. The methods already patched with mocks are counted by
+        their mocks, the others are wrapped for the time of the block.
+
+        :param budget: the maximum numbers of calls, keyed by the path of
+                       the method, as passed to mock.patch
+        :type  budget: dict
+        """
+        counters = [_CallCounter(target) for target in sorted(budget)]
+        for counter in counters:
+            counter.start()
+        try:
+            yield
+        finally:
+            for counter in reversed(counters):
+                counter.stop()
+        for counter in counters:
+            self.assertLessEqual(
+                counter.calls, budget[counter.target],
+                "%s was called %d times, over its budget of %d." % (
+                    counter.target, counter.calls, budget[counter.target]))
+
 
 @unittest.skipIf(os.environ.get('SKIP_UNITTESTS', False),
                  "The SKIP_UNITTESTS env variable is set.")
@@ -152,6 +152,9 @@ NOSE_ARGS = ['--nocapture',
 
 TUSKAR_ENDPOINT_URL = "http://127.0.0.1:8585"
 
+# Don't generate Keystone certificates in the background during the tests.
+TUSKAR_KEYSTONE_PKI_POOL_SIZE = 0
+
 OVERCLOUD_CREDS = {
     'enabled': True,
     'user': 'admin',
@@ -0,0 +1,110 @@
+# -*- coding: utf8 -*-
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import threading
+import time
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+_lookup_observers = []
+
+
+class TTLCache(object):
+    """A bounded, thread-safe LRU cache with expiring entries.
+
+    Unlike ``horizon.utils.memoized``, the cache outlives a single request,
+    so the keys must never contain request objects. At most ``maxsize``
+    entries are kept, the least recently used being evicted first, and an
+    entry is dropped once it is older than ``ttl`` seconds.
+
+    Every cache is registered under its ``name``, so that all of them can be
+    inspected with :func:`stats` and emptied with :func:`clear_all`.
+    """
+
+    def __init__(self, name, maxsize=128, ttl=60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        with _caches_lock:
+            _caches[name] = self
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key``, or ``default`` if missing."""
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                expires, value = 0, default
+            hit = expires >= time.time()
+            if hit:
+                # Re-insert to mark the entry as the most recently used one.
+                self._data[key] = (expires, value)
+                self.hits += 1
+            else:
+                self.misses += 1
+        for observer in _lookup_observers:
+            observer(self.name, hit)
+        return value if hit else default
+
+    def set(self, key, value, ttl=None):
+        """Store ``value`` under ``key``, evicting old entries if needed."""
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + ttl, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove ``key`` from the cache and return its value."""
+        with self._lock:
+            try:
+                return self._data.pop(key)[1]
+            except KeyError:
+                return default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def stats():
+    """Return a dict of (size, hits, misses) tuples keyed by cache name."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return dict((cache.name, (len(cache), cache.hits, cache.misses))
+                for cache in caches)
+
+
+def add_lookup_observer(observer):
+    """Call ``observer`` with the cache name and the hit flag on every get."""
+    _lookup_observers.append(observer)
+
+
+def clear_all():
+    """Empty all the registered caches."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.clear()
@@ -0,0 +1,270 @@
+# -*- coding: utf8 -*-
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Counters and histograms exposed in the Prometheus text format.
+
+Add ``tuskar_ui.utils.metrics.MetricsMiddleware`` to the
+``MIDDLEWARE_CLASSES`` to collect the latency of the backend calls, the
+render time of the infrastructure pages and the rate of their AJAX
+requests. The metrics, together with the hits and misses of the caches,
+are served by the ``metrics`` view of the infrastructure dashboard.
+
+Like the rest of the dashboard, that view requires an admin session. To let
+Prometheus scrape it, set ``TUSKAR_METRICS_TOKEN`` and configure the scrape
+job with the same ``bearer_token``. The middleware then answers the
+requests for the ``metrics`` view carrying that token itself, and refuses
+the ones carrying another token.
+"""
+
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.core import urlresolvers
+from django import http
+from django.utils import crypto
+
+from tuskar_ui.utils import cache
+from tuskar_ui.utils import tracing
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_TOKEN = getattr(settings, 'TUSKAR_METRICS_TOKEN', None)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+_metrics = []
+_install_lock = threading.Lock()
+_installed = False
+
+
+def _format_labels(names, values, extra=()):
+    labels = list(zip(names, values)) + list(extra)
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, unicode(value).replace('\\', r'\\')
+                     .replace('"', r'\"').replace('\n', r'\n'))
+        for (name, value) in labels)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric(object):
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def samples(self):
+        """Yield the (name, labels, value) of every sample."""
+        raise NotImplementedError
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.documentation),
+                 '# TYPE %s %s' % (self.name, self.kind)]
+        lines.extend('%s%s %s' % (name, labels, _format_value(value))
+                     for (name, labels, value) in self.samples())
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """A value that only goes up, one per set of label values."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Histogram(_Metric):
+    """Counts the observed values in buckets, one per set of label values.
+
+    The buckets are the upper bounds of the counted values, the last and
+    open one being added.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # The counts of every bucket, followed by the sum.
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, list(counts))
+                            for (key, counts) in self._values.items())
+        for key, counts in values:
+            total = 0
+            for bound, count in zip(self.buckets, counts):
+                total += count
+                yield ('%s_bucket' % self.name,
+                       _format_labels(self.labels, key,
+                                      [('le', _format_value(bound))]),
+                       total)
+            labels = _format_labels(self.labels, key)
+            yield '%s_sum' % self.name, labels, counts[-1]
+            yield '%s_count' % self.name, labels, total
+
+
+backend_call_seconds = Histogram(
+    'tuskar_backend_call_seconds',
+    'The duration of the calls to the backend services.',
+    ('service', 'method'))
+page_render_seconds = Histogram(
+    'tuskar_page_render_seconds',
+    'The time taken to render the pages of the infrastructure panels.',
+    ('panel',))
+ajax_requests = Counter(
+    'tuskar_ajax_requests_total',
+    'The AJAX requests made by the infrastructure panels.',
+    ('panel', 'view'))
+
+
+def _cache_lines():
+    # The caches keep their own counts, so they cost nothing until scraped.
+    stats = sorted(cache.stats().items())
+    for (name, kind, documentation, index) in (
+            ('tuskar_cache_hits_total', 'counter',
+             'The lookups answered by the caches.', 1),
+            ('tuskar_cache_misses_total', 'counter',
+             'The lookups missed by the caches.', 2),
+            ('tuskar_cache_entries', 'gauge',
+             'The entries held by the caches.', 0)):
+        yield '# HELP %s %s' % (name, documentation)
+        yield '# TYPE %s %s' % (name, kind)
+        for cache_name, values in stats:
+            yield '%s%s %s' % (name, _format_labels(('cache',), (cache_name,)),
+                               _format_value(values[index]))
+
+
+def render():
+    """Return all the metrics in the Prometheus text format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    lines.extend(_cache_lines())
+    return '\n'.join(lines) + '\n'
+
+
+def scrape_response():
+    return http.HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+def _metrics_path():
+    # Resolved on each request, as the URLs are not loaded yet at import
+    # time, and the path includes the WEBROOT of the dashboard.
+    return urlresolvers.reverse('horizon:infrastructure:metrics')
+
+
+def _scrape_token(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _sep, token = authorization.partition(' ')
+    if scheme.lower() == 'bearer':
+        return token.strip()
+
+
+def clear_all():
+    """Reset all the metrics."""
+    for metric in _metrics:
+        metric.clear()
+
+
+def _observe_call(call):
+    if call.service != 'cache':
+        backend_call_seconds.observe(call.duration, service=call.service,
+                                     method=call.method)
+
+
+def install():
+    """Start measuring the calls to the backend services."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        tracing.install()
+        tracing.add_observer(_observe_call)
+        _installed = True
+
+
+class MetricsMiddleware(object):
+    """Measures the pages and AJAX requests of the infrastructure panels."""
+
+    def __init__(self):
+        install()
+
+    def process_request(self, request):
+        request._tuskar_metrics_started = time.time()
+        if METRICS_TOKEN and request.path == _metrics_path():
+            # The scrapers have no session, they authenticate with the
+            # token instead.
+            token = _scrape_token(request)
+            if token is not None:
+                if crypto.constant_time_compare(token, METRICS_TOKEN):
+                    return scrape_response()
+                return http.HttpResponse(status=401)
+
+    def process_response(self, request, response):
+        started = getattr(request, '_tuskar_metrics_started', None)
+        horizon = getattr(request, 'horizon', None) or {}
+        dashboard = horizon.get('dashboard')
+        panel = horizon.get('panel')
+        if (started is None or panel is None or
+                getattr(dashboard, 'slug', None) != 'infrastructure'):
+            return response
+        if request.is_ajax():
+            match = getattr(request, 'resolver_match', None)
+            ajax_requests.inc(panel=panel.slug,
+                              view=getattr(match, 'url_name', None) or '')
+        else:
+            page_render_seconds.observe(time.time() - started,
+                                        panel=panel.slug)
+        return response
@@ -0,0 +1,97 @@
+# -*- coding: utf8 -*-
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+import Queue
+import threading
+
+from django.conf import settings
+from os_cloud_config import keystone_pki
+
+
+LOG = logging.getLogger(__name__)
+
+KEYSTONE_PKI_POOL_SIZE = getattr(settings, 'TUSKAR_KEYSTONE_PKI_POOL_SIZE', 1)
+
+
+def make_keystone_certificates():
+    """Generate a new CA and the Keystone signing pair issued by it
+
+    The CA key is only used to sign the signing certificate, and is not
+    returned.
+
+    :return: the Keystone certificate parameters
+    :rtype:  dict
+    """
+    ca_key_pem, ca_cert_pem = keystone_pki.create_ca_pair()
+    signing_key_pem, signing_cert_pem = keystone_pki.create_signing_pair(
+        ca_key_pem, ca_cert_pem)
+    return {
+        'KeystoneSigningCertificate': signing_cert_pem,
+        'KeystoneCACertificate': ca_cert_pem,
+        'KeystoneSigningKey': signing_key_pem,
+    }
+
+
+class CertificatePool(object):
+    """A bounded pool of Keystone certificates generated in the background
+
+    Generating the RSA keys takes seconds, so a few sets of certificates are
+    made ahead of time by a background thread. Each set is only handed out
+    once, and the sets are only kept in the memory of this process. A size
+    of 0 disables the pool, and the certificates are made when asked for.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._certificates = Queue.Queue(maxsize=max(size, 1))
+        self._lock = threading.Lock()
+        self._filling = False
+
+    def take(self):
+        """Return a new set of certificates, and start making another one."""
+        try:
+            certificates = self._certificates.get_nowait()
+        except Queue.Empty:
+            certificates = make_keystone_certificates()
+        self.refill()
+        return certificates
+
+    def refill(self):
+        """Start filling the pool in the background, unless it is full."""
+        with self._lock:
+            if (self.size <= 0 or self._filling or
+                    self._certificates.full()):
+                return
+            self._filling = True
+        thread = threading.Thread(target=self._fill)
+        thread.daemon = True
+        thread.start()
+
+    def _fill(self):
+        try:
+            while True:
+                with self._lock:
+                    if self._certificates.full():
+                        self._filling = False
+                        return
+                # Only this thread puts into the queue, so it can't block.
+                self._certificates.put(make_keystone_certificates())
+        except Exception:
+            LOG.exception('Unable to generate the Keystone certificates.')
+            with self._lock:
+                self._filling = False
+
+
+keystone_certificates = CertificatePool(KEYSTONE_PKI_POOL_SIZE)
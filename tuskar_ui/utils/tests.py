@@ -15,11 +15,17 @@
 import collections
 import datetime
 
+from django.core import exceptions
+from django.core import urlresolvers
 from django.utils.translation import ugettext_lazy as _
 import mock
 
 from tuskar_ui.test import helpers
+from tuskar_ui.utils import cache
 from tuskar_ui.utils import metering
+from tuskar_ui.utils import metrics
+from tuskar_ui.utils import pki
+from tuskar_ui.utils import tracing
 from tuskar_ui.utils import utils
 
 
@@ -165,6 +171,43 @@ class UtilsTests(helpers.TestCase):
                          unicode(_("Unknown driver: %s.") % 'wrong_driver'))
 
 
+class CacheTests(helpers.TestCase):
+    def test_get_set(self):
+        c = cache.TTLCache('test_get_set')
+        self.assertIsNone(c.get('foo'))
+        c.set('foo', 1)
+        self.assertEqual(c.get('foo'), 1)
+        self.assertEqual(c.get('bar', 2), 2)
+        self.assertEqual((c.hits, c.misses), (1, 2))
+
+    def test_lru_eviction(self):
+        c = cache.TTLCache('test_lru_eviction', maxsize=2)
+        c.set('a', 1)
+        c.set('b', 2)
+        c.get('a')
+        c.set('c', 3)
+        self.assertEqual(len(c), 2)
+        self.assertIsNone(c.get('b'))
+        self.assertEqual(c.get('a'), 1)
+        self.assertEqual(c.get('c'), 3)
+
+    def test_expiry(self):
+        c = cache.TTLCache('test_expiry', ttl=10)
+        with mock.patch('time.time', return_value=100):
+            c.set('foo', 1)
+        with mock.patch('time.time', return_value=105):
+            self.assertEqual(c.get('foo'), 1)
+        with mock.patch('time.time', return_value=111):
+            self.assertIsNone(c.get('foo'))
+
+    def test_clear_all(self):
+        c = cache.TTLCache('test_clear_all')
+        c.set('foo', 1)
+        cache.clear_all()
+        self.assertEqual(len(c), 0)
+        self.assertIn('test_clear_all', cache.stats())
+
+
 class MeteringTests(helpers.TestCase):
     def test_query_data(self):
         Meter = collections.namedtuple('Meter', 'name unit')
@@ -294,3 +337,214 @@ class MeteringTests(helpers.TestCase):
         self.assertEqual(create_json_output.call_args_list, [
             mock.call([], None, '', 'from date', 'to date')
         ])
+
+
+class CertificatePoolTests(helpers.TestCase):
+    def test_take(self):
+        certificates = [{'KeystoneCACertificate': str(i)} for i in range(3)]
+        pool = pki.CertificatePool(2)
+
+        with mock.patch('tuskar_ui.utils.pki.make_keystone_certificates',
+                        side_effect=certificates) as make, mock.patch(
+                'tuskar_ui.utils.pki.CertificatePool.refill') as refill:
+            # Fill the pool the way the background thread does.
+            pool._fill()
+            self.assertEqual(make.call_count, 2)
+            self.assertEqual(pool.take(), certificates[0])
+            self.assertEqual(pool.take(), certificates[1])
+            # Once the pool is empty, the certificates are made on demand.
+            self.assertEqual(pool.take(), certificates[2])
+        self.assertEqual(make.call_count, 3)
+        self.assertEqual(refill.call_count, 3)
+
+    def test_disabled(self):
+        pool = pki.CertificatePool(0)
+
+        with mock.patch('threading.Thread') as thread:
+            pool.refill()
+        self.assertFalse(thread.called)
+
+
+class TracingTests(helpers.TestCase):
+    def tearDown(self):
+        super(TracingTests, self).tearDown()
+        tracing.stop()
+
+    def test_traced_client(self):
+        client = mock.Mock(spec=['node'])
+        client.node.list.return_value = ['node']
+
+        with mock.patch('tuskar_ui.utils.tracing._installed', True):
+            traced = tracing.traced_client('ironic', client)
+        trace = tracing.start()
+        self.assertEqual(traced.node.list(associated=False), ['node'])
+        tracing._record_lookup('test_traced_client', True)
+        tracing._record_lookup('test_traced_client', False)
+        tracing.stop()
+
+        client.node.list.assert_called_once_with(associated=False)
+        self.assertEqual(len(trace.calls), 3)
+        call = trace.calls[0]
+        self.assertEqual((call.service, call.method, call.args),
+                         ('ironic', 'node.list', 'associated=bool'))
+        summary = trace.summary()
+        self.assertIn('calls=1', summary)
+        self.assertIn('ironic=1/', summary)
+        self.assertIn('cache=1/2', summary)
+
+    def test_arguments_not_recorded(self):
+        stack_create = tracing.traced_function('heat', 'stack_create',
+                                               lambda *a, **kw: None)
+
+        trace = tracing.start()
+        stack_create('overcloud', 'secret', parameters={'Key': 'secret'})
+        self.assertEqual(trace.calls[0].args, 'str, str, parameters=dict')
+        tracing.stop()
+        with mock.patch('tuskar_ui.utils.tracing._observers', [mock.Mock()]):
+            stack_create('overcloud', 'secret')
+            call = tracing._observers[0].call_args[0][0]
+        self.assertEqual(call.args, '')
+
+    def test_nested_calls(self):
+        inner = tracing.traced_function('nova', 'inner', lambda: 1)
+        outer = tracing.traced_function('nova', 'outer', lambda: inner())
+
+        trace = tracing.start()
+        self.assertEqual(outer(), 1)
+        self.assertEqual([call.method for call in trace.calls], ['outer'])
+
+    def test_middleware(self):
+        request = self.factory.get('/infrastructure/')
+        response = {}
+
+        with mock.patch('tuskar_ui.utils.tracing.install') as install:
+            with self.settings(TUSKAR_API_TRACING=True):
+                middleware = tracing.TracingMiddleware()
+        self.assertTrue(install.called)
+        request.user = mock.Mock(is_superuser=True)
+        middleware.process_request(request)
+        tracing.traced_function('heat', 'stack_get', lambda r: None)(request)
+        middleware.process_response(request, response)
+
+        self.assertIn('heat=1/', response['X-Tuskar-Timing'])
+        self.assertIsNone(tracing.current())
+
+    def test_middleware_disabled(self):
+        with mock.patch('tuskar_ui.utils.tracing.install') as install:
+            self.assertRaises(exceptions.MiddlewareNotUsed,
+                              tracing.TracingMiddleware)
+        self.assertFalse(install.called)
+
+    def test_middleware_header_not_sent(self):
+        request = self.factory.get('/infrastructure/')
+        request.user = mock.Mock(is_superuser=False)
+        response = {}
+
+        with mock.patch('tuskar_ui.utils.tracing.install'):
+            with self.settings(TUSKAR_API_TRACING=True):
+                middleware = tracing.TracingMiddleware()
+        with self.settings(DEBUG=False):
+            middleware.process_request(request)
+            middleware.process_response(request, response)
+        self.assertNotIn('X-Tuskar-Timing', response)
+
+        with self.settings(DEBUG=True):
+            middleware.process_request(request)
+            middleware.process_response(request, response)
+        self.assertIn('X-Tuskar-Timing', response)
+
+
+class MetricsTests(helpers.TestCase):
+    def setUp(self):
+        super(MetricsTests, self).setUp()
+        cache.clear_all()
+        metrics.clear_all()
+
+    def test_render(self):
+        metrics._observe_call(tracing.Call('ironic', 'node.list', 0.02, '',
+                                           False))
+        metrics._observe_call(tracing.Call('ironic', 'node.list', 3, '',
+                                           False))
+        metrics._observe_call(tracing.Call('cache', 'nodes', 0, '', True))
+        c = cache.TTLCache('test_render')
+        c.set('foo', 1)
+        c.get('foo')
+
+        lines = metrics.render().splitlines()
+        self.assertIn('tuskar_backend_call_seconds_bucket{service="ironic",'
+                      'method="node.list",le="0.025"} 1.0', lines)
+        self.assertIn('tuskar_backend_call_seconds_bucket{service="ironic",'
+                      'method="node.list",le="+Inf"} 2.0', lines)
+        self.assertIn('tuskar_backend_call_seconds_count{service="ironic",'
+                      'method="node.list"} 2.0', lines)
+        self.assertIn('tuskar_cache_hits_total{cache="test_render"} 1.0',
+                      lines)
+        self.assertIn('# TYPE tuskar_backend_call_seconds histogram', lines)
+
+    def test_middleware(self):
+        request = self.factory.get('/infrastructure/nodes/')
+        request.horizon = {'dashboard': mock.Mock(slug='infrastructure'),
+                           'panel': mock.Mock(slug='nodes')}
+
+        with mock.patch('tuskar_ui.utils.metrics.install'):
+            middleware = metrics.MetricsMiddleware()
+        middleware.process_request(request)
+        middleware.process_response(request, {})
+        request.META['HTTP_X_REQUESTED_WITH'] = 'XMLHttpRequest'
+        request.resolver_match = mock.Mock(url_name='index')
+        middleware.process_response(request, {})
+
+        rendered = metrics.render()
+        self.assertIn('tuskar_page_render_seconds_count{panel="nodes"} 1.0',
+                      rendered)
+        self.assertIn('tuskar_ajax_requests_total{panel="nodes",'
+                      'view="index"} 1.0', rendered)
+
+    def test_middleware_scrape_token(self):
+        request = self.factory.get(urlresolvers.reverse(
+            'horizon:infrastructure:metrics'))
+        with mock.patch('tuskar_ui.utils.metrics.install'):
+            middleware = metrics.MetricsMiddleware()
+
+        with mock.patch('tuskar_ui.utils.metrics.METRICS_TOKEN', 'secret'):
+            # Without a token, the request goes on to the dashboard view.
+            self.assertIsNone(middleware.process_request(request))
+            request.META['HTTP_AUTHORIZATION'] = 'Bearer wrong'
+            self.assertEqual(
+                middleware.process_request(request).status_code, 401)
+            request.META['HTTP_AUTHORIZATION'] = 'Bearer secret'
+            res = middleware.process_request(request)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], metrics.CONTENT_TYPE)
+
+        # The token is only checked when it is set.
+        self.assertIsNone(middleware.process_request(request))
+
+
+class MetricsViewTests(helpers.BaseAdminViewTests):
+    def test_metrics(self):
+        res = self.client.get(urlresolvers.reverse(
+            'horizon:infrastructure:metrics'))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn('# TYPE tuskar_ajax_requests_total counter',
+                      res.content)
+
+
+class CallBudgetTests(helpers.TestCase):
+    def test_within_budget(self):
+        de_camel_case = utils.de_camel_case
+        with self.assertCallBudget({
+                'tuskar_ui.utils.utils.de_camel_case': 1}):
+            self.assertEqual(utils.de_camel_case('CamelCase'), 'Camel Case')
+        self.assertIs(utils.de_camel_case, de_camel_case)
+
+    def test_over_budget(self):
+        with mock.patch('tuskar_ui.utils.cache.TTLCache.get') as get:
+            c = cache.TTLCache('test_over_budget')
+            with self.assertRaises(AssertionError):
+                with self.assertCallBudget({
+                        'tuskar_ui.utils.cache.TTLCache.get': 1}):
+                    c.get('foo')
+                    c.get('bar')
+        self.assertEqual(get.call_count, 2)
@@ -0,0 +1,288 @@
+# -*- coding: utf8 -*-
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Opt-in tracing of the backend API calls made for every request.
+
+Add ``tuskar_ui.utils.tracing.TracingMiddleware`` to the
+``MIDDLEWARE_CLASSES`` and set ``TUSKAR_API_TRACING`` to enable it. Every
+call to Ironic, Nova, Heat, Tuskar, Glance, Neutron, Keystone, Ceilometer
+and discoverd is then recorded with its duration and the types of its
+arguments, together with the hits and misses of the caches, and a summary
+of each request is logged. The summary is also sent in the
+``X-Tuskar-Timing`` response header to the admins, or to everyone when
+``DEBUG`` is on.
+"""
+
+import collections
+import functools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core import exceptions
+
+from tuskar_ui.utils import cache
+
+
+LOG = logging.getLogger(__name__)
+
+TIMING_HEADER = getattr(settings, 'TUSKAR_TIMING_HEADER', 'X-Tuskar-Timing')
+
+# The openstack_dashboard API modules and the clients, by service.
+TRACED_MODULES = (
+    ('nova', 'openstack_dashboard.api.nova'),
+    ('heat', 'openstack_dashboard.api.heat'),
+    ('glance', 'openstack_dashboard.api.glance'),
+    ('neutron', 'openstack_dashboard.api.neutron'),
+    ('keystone', 'openstack_dashboard.api.keystone'),
+    ('ceilometer', 'openstack_dashboard.api.ceilometer'),
+    ('discoverd', 'ironic_discoverd.client'),
+)
+
+Call = collections.namedtuple('Call', ['service', 'method', 'duration',
+                                       'args', 'cached'])
+
+_local = threading.local()
+_observers = []
+_install_lock = threading.Lock()
+_installed = False
+
+
+class Trace(object):
+    """The calls recorded while handling a single request."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, call):
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self):
+        """Sum up the calls and their durations by service
+
+        :return: for example ``time=52.1ms, calls=3, ironic=2/40.5ms,
+                 heat=1/8.3ms, cache=4/5``, with the hits out of all the
+                 cache lookups
+        :rtype:  str
+        """
+        services = collections.OrderedDict()
+        hits = lookups = 0
+        for call in self.calls:
+            if call.service == 'cache':
+                lookups += 1
+                hits += call.cached
+                continue
+            count, duration = services.get(call.service, (0, 0.0))
+            services[call.service] = (count + 1, duration + call.duration)
+        parts = [
+            'time=%.1fms' % ((time.time() - self.started) * 1000),
+            'calls=%d' % sum(count for (count, d) in services.values()),
+        ]
+        parts.extend('%s=%d/%.1fms' % (service, count, duration * 1000)
+                     for (service, (count, duration)) in services.items())
+        parts.append('cache=%d/%d' % (hits, lookups))
+        return ', '.join(parts)
+
+
+def current():
+    """Return the Trace of the current thread, or None."""
+    return getattr(_local, 'trace', None)
+
+
+def start():
+    _local.trace = Trace()
+    return _local.trace
+
+
+def stop():
+    trace = current()
+    _local.trace = None
+    return trace
+
+
+def add_observer(observer):
+    """Call ``observer`` with every Call, even outside of the requests."""
+    _observers.append(observer)
+
+
+def propagate(func):
+    """Record the calls made by ``func`` in another thread in this Trace."""
+    trace = current()
+    if trace is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _local.trace = trace
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.trace = None
+    return wrapper
+
+
+def _format_args(args, kwargs):
+    # Only the types are recorded, as the values include the passwords and
+    # keys of the plans. The request objects are in nearly every call, and
+    # say nothing.
+    formatted = [type(arg).__name__ for arg in args
+                 if not hasattr(arg, 'META')]
+    formatted.extend('%s=%s' % (name, type(value).__name__)
+                     for (name, value) in sorted(kwargs.items()))
+    return ', '.join(formatted)
+
+
+def _record(call):
+    trace = current()
+    if trace is not None:
+        trace.add(call)
+    for observer in _observers:
+        observer(call)
+
+
+def _is_traced():
+    # Calls made by other traced calls are part of them.
+    return ((current() is not None or _observers) and
+            not getattr(_local, 'depth', 0))
+
+
+def traced_function(service, method, func):
+    """Wrap ``func`` to record its calls as ``method`` of ``service``."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _is_traced():
+            return func(*args, **kwargs)
+        _local.depth = 1
+        started = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.depth = 0
+            # The observers don't need the arguments.
+            formatted = (_format_args(args, kwargs)
+                         if current() is not None else '')
+            _record(Call(service, method, time.time() - started,
+                         formatted, False))
+    wrapper.traced = True
+    return wrapper
+
+
+class _TracedProxy(object):
+    """Records the calls of the methods of a client and its managers."""
+
+    _plain_types = (basestring, int, long, float, bool, list, tuple, dict,
+                    type(None))
+
+    def __init__(self, service, wrapped, path=''):
+        self._service = service
+        self._wrapped = wrapped
+        self._path = path
+
+    def __getattr__(self, name):
+        value = getattr(self._wrapped, name)
+        path = '%s.%s' % (self._path, name) if self._path else name
+        if name.startswith('_') or isinstance(value, self._plain_types):
+            return value
+        if callable(value):
+            return traced_function(self._service, path, value)
+        return _TracedProxy(self._service, value, path)
+
+
+def traced_client(service, client):
+    """Return the client, recording its calls when tracing is enabled."""
+    if not _installed:
+        return client
+    return _TracedProxy(service, client)
+
+
+def _trace_module(service, module):
+    for name, value in vars(module).items():
+        if (name.startswith('_') or not callable(value) or
+                isinstance(value, type) or getattr(value, 'traced', False) or
+                getattr(value, '__module__', None) != module.__name__):
+            continue
+        if name.endswith('client'):
+            # The client factories are cheap, their clients are what calls
+            # the backends.
+            traced = _traced_factory(service, value)
+        else:
+            traced = traced_function(service, name, value)
+        setattr(module, name, traced)
+
+
+def _traced_factory(service, factory):
+    @functools.wraps(factory)
+    def wrapper(*args, **kwargs):
+        return traced_client(service, factory(*args, **kwargs))
+    wrapper.traced = True
+    return wrapper
+
+
+def _record_lookup(name, hit):
+    if current() is not None or _observers:
+        _record(Call('cache', name, 0.0, '', hit))
+
+
+def install():
+    """Start recording the calls of all the traced modules and clients."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        for service, module_name in TRACED_MODULES:
+            try:
+                module = __import__(module_name, fromlist=['*'])
+            except ImportError:
+                LOG.debug('Not tracing %s, %s is missing.',
+                          service, module_name)
+                continue
+            _trace_module(service, module)
+        cache.add_lookup_observer(_record_lookup)
+        _installed = True
+
+
+def _is_admin(request):
+    user = getattr(request, 'user', None)
+    return getattr(user, 'is_superuser', False)
+
+
+class TracingMiddleware(object):
+    """Logs the backend calls made for every request, and their timing."""
+
+    def __init__(self):
+        if not getattr(settings, 'TUSKAR_API_TRACING', False):
+            raise exceptions.MiddlewareNotUsed
+        install()
+
+    def process_request(self, request):
+        start()
+
+    def process_response(self, request, response):
+        trace = stop()
+        if trace is None:
+            return response
+        summary = trace.summary()
+        for call in trace.calls:
+            if call.service != 'cache':
+                LOG.debug('%s.%s(%s) took %.1fms', call.service, call.method,
+                          call.args, call.duration * 1000)
+        LOG.info('%s %s: %s', request.method, request.path, summary)
+        if TIMING_HEADER and (settings.DEBUG or _is_admin(request)):
+            response[TIMING_HEADER] = summary
+        return response